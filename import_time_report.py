@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Import-time report for the FastAPI app (based on `python -X importtime`)
+
+Compares the cold import of `endpoint` (lazy heavy dependencies) with an
+eager baseline that also imports the stack `model.py` used to load at
+import time.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
+
+# Modules that used to be imported eagerly by src/model.py and src/ingest.py
+HEAVY_MODULES = [
+    "torch",
+    "transformers",
+    "chromadb",
+    "llama_index.core",
+    "llama_index.embeddings.huggingface",
+    "llama_index.vector_stores.chroma",
+    "llama_index.llms.gemini",
+]
+
+LAZY_CODE = "import endpoint"
+# Heavy modules that fail to import are printed to stdout, one per line, so
+# the report never passes off a partial baseline as a saving
+EAGER_CODE = "import endpoint\n" + "\n".join(
+    f"try:\n    import {name}\nexcept ImportError:\n    print({name!r})" for name in HEAVY_MODULES
+)
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(code):
+    """Run `code` in a fresh interpreter with -X importtime and parse stderr.
+
+    Returns (total_us, {module: cumulative_us}, stdout lines).
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"Import failed:\n{tail}")
+
+    total_us = 0
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative_us = int(match.group(2))
+        module = match.group(4)
+        cumulative[module] = cumulative_us
+        # Top-level imports have a single space of indentation
+        if len(match.group(3)) == 1:
+            total_us += cumulative_us
+    return total_us, cumulative, result.stdout.split()
+
+
+def print_top(cumulative, limit):
+    for module, us in sorted(cumulative.items(), key=lambda item: -item[1])[:limit]:
+        print(f"  {us / 1000:10.1f} ms  {module}")
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    print("⏱️  Import-time Report (python -X importtime)")
+    print("=" * 60)
+
+    lazy_total, lazy_modules, _ = measure(LAZY_CODE)
+    eager_total, eager_modules, output = measure(EAGER_CODE)
+    missing = [name for name in HEAVY_MODULES if name in output]
+
+    print(f"Lazy  (import endpoint):          {lazy_total / 1000:10.1f} ms")
+    print(f"Eager (endpoint + heavy deps):    {eager_total / 1000:10.1f} ms")
+    if missing:
+        print("⚠️  Not installed, so the eager baseline is incomplete: " + ", ".join(missing))
+        print("Cold-start saving:                not measured")
+    elif eager_total:
+        saved = eager_total - lazy_total
+        print(f"Cold-start saving:                {saved / 1000:10.1f} ms "
+              f"({100 * saved / eager_total:.0f}%)")
+
+    print("\n" + "=" * 60)
+    print("📦 Heavy modules loaded by `import endpoint`")
+    print("=" * 60)
+    for name in HEAVY_MODULES:
+        status = "❌ loaded" if name in lazy_modules else "✅ deferred"
+        print(f"  {status:12} {name}")
+
+    print("\n" + "=" * 60)
+    print(f"🐢 Top {limit} imports (lazy, cumulative)")
+    print("=" * 60)
+    print_top(lazy_modules, limit)
+
+    print("\n" + "=" * 60)
+    print(f"🐢 Top {limit} imports (eager, cumulative)")
+    print("=" * 60)
+    print_top(eager_modules, limit)
+
+    if missing:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
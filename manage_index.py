@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Vector index maintenance for Constitution Study Chatbot
+
+    python manage_index.py compact [collection] [--dry-run]
+    python manage_index.py quantize [collection] [--quantization int8|float16] [--ann ivf|flat|hnsw]
+    python manage_index.py report [collection] [-k 5] [--queries 100]
+"""
+
+import sys
+import os
+import argparse
+
+# Add src to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from model import collection_name
+from index_maintenance import compact, quantize, report
+from quantized_index import QUANTIZATIONS, ANN_TYPES
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def add_build_args(parser):
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="int8")
+    parser.add_argument("--ann", choices=ANN_TYPES, default="ivf",
+                        help="ivf: scan only the inverted lists nearest to the query; "
+                             "flat: scan every quantized code; "
+                             "hnsw: hnswlib keeps a float32 copy of every vector, "
+                             "so there is no memory saving")
+    parser.add_argument("--ivf-lists", type=positive_int, default=None,
+                        help="Inverted lists (default: about 4 * sqrt(chunks))")
+    parser.add_argument("--ivf-probe", type=positive_int, default=32,
+                        help="Lists scanned per query")
+    parser.add_argument("--hnsw-m", type=int, default=16, help="HNSW graph degree (M)")
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--rescore-factor", type=int, default=4,
+                        help="Candidates re-scored at full precision = factor * k")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Maintain the vector index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compact_parser = commands.add_parser("compact", help="Remove duplicate and orphaned chunks")
+    compact_parser.add_argument("collection", nargs="?", default=collection_name)
+    compact_parser.add_argument("--dry-run", action="store_true")
+
+    quantize_parser = commands.add_parser("quantize", help="Build the quantized ANN index")
+    quantize_parser.add_argument("collection", nargs="?", default=collection_name)
+    add_build_args(quantize_parser)
+
+    report_parser = commands.add_parser("report", help="Index size and recall vs exact search")
+    report_parser.add_argument("collection", nargs="?", default=collection_name)
+    report_parser.add_argument("-k", type=positive_int, default=5)
+    report_parser.add_argument("--queries", type=positive_int, default=100)
+    report_parser.add_argument("--rebuild", action="store_true",
+                               help="Evaluate an in-memory build with the options below "
+                                    "instead of the saved index")
+    add_build_args(report_parser)
+    return parser.parse_args()
+
+
+def build_kwargs(args):
+    return {
+        "quantization": args.quantization,
+        "ann": args.ann,
+        "hnsw_m": args.hnsw_m,
+        "ef_construction": args.ef_construction,
+        "ef_search": args.ef_search,
+        "rescore_factor": args.rescore_factor,
+        "ivf_lists": args.ivf_lists,
+        "ivf_probe": args.ivf_probe,
+    }
+
+
+def print_size(size):
+    mib = 1024 * 1024
+    print(f"  Vectors:        {size['count']} x {size['dim']}")
+    print(f"  float32:        {size['float32_bytes'] / mib:10.2f} MiB")
+    print(f"  Quantized:      {(size['codes_bytes'] + size['scales_bytes']) / mib:10.2f} MiB")
+    if "hnsw_bytes" in size:
+        print(f"  HNSW (approx.): {size['hnsw_bytes'] / mib:10.2f} MiB")
+    if "ivf_bytes" in size:
+        print(f"  IVF lists:      {size['ivf_bytes'] / mib:10.2f} MiB")
+
+
+def main():
+    args = parse_args()
+
+    if args.command == "compact":
+        summary = compact(args.collection, dry_run=args.dry_run)
+        print(f"🧹 Compaction of '{summary['collection']}'" + (" (dry run)" if args.dry_run else ""))
+        print("=" * 60)
+        print(f"  Chunks before:  {summary['before']}")
+        print(f"  Duplicates:     {summary['duplicates']}")
+        print(f"  Orphans:        {summary['orphans']}")
+        print(f"  Chunks after:   {summary['after']}")
+
+    elif args.command == "quantize":
+        size = quantize(args.collection, **build_kwargs(args))
+        print(f"📦 Quantized index for '{args.collection}' ({args.quantization}, {args.ann})")
+        print("=" * 60)
+        print_size(size)
+
+    elif args.command == "report":
+        kwargs = build_kwargs(args) if args.rebuild else {}
+        result = report(args.collection, k=args.k, num_queries=args.queries, **kwargs)
+        recall = result["recall"]
+        print(f"📊 Index Report for '{result['collection']}'")
+        print("=" * 60)
+        print(f"  Chroma chunks:  {result['chroma_count']}")
+        print(f"  Quantization:   {result['quantization']}")
+        if result["ann"] == "hnsw":
+            params = f"M={result['hnsw_m']}, ef_search={result['ef_search']}, "
+        elif result["ann"] == "ivf":
+            params = f"lists={result['ivf_lists']}, probe={result['ivf_probe']}, "
+        else:
+            params = ""
+        print(f"  ANN:            {result['ann']} ({params}rescore x{result['rescore_factor']})")
+        print_size(result["size"])
+        if recall["queries"] and recall["recall_ann"] is not None:
+            print("\n" + "=" * 60)
+            print(f"🎯 Recall@{recall['k']} vs exact search "
+                  f"({recall['queries']} {recall['query_source']} queries)")
+            print("=" * 60)
+            print(f"  ANN only:           {recall['recall_ann']:.3f}   "
+                  f"{recall['latency_ms_ann']:8.3f} ms/query")
+            print(f"  ANN + re-scoring:   {recall['recall_ann_rescored']:.3f}   "
+                  f"{recall['latency_ms_ann_rescored']:8.3f} ms/query")
+            print(f"  Exact (float32):    1.000   {recall['latency_ms_exact']:8.3f} ms/query")
+            print(f"  Speed-up vs exact:  {recall['speedup_ann_rescored']:.1f}x (ANN + re-scoring)")
+
+
+if __name__ == "__main__":
+    main()
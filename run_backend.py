@@ -1,17 +1,56 @@
 #!/usr/bin/env python3
 """
 Run script for Constitution Study Chatbot
+
+    python run_backend.py                 # single process (queries + ingestion)
+    python run_backend.py --workers 4     # 1 ingestion writer + 4 read-only query workers
 """
 
 import sys
 import os
+import argparse
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src')
 
 # Add src to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.insert(0, SRC_DIR)
 
-# Import from src
-from endpoint import app
 
-if __name__ == "__main__":
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the FastAPI backend")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of read-only query workers (>1 enables multi-worker mode)")
+    return parser.parse_args()
+
+
+def run_multi_worker(host, port, workers):
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000)
+
+    # One writer process owns ingestion into the persistent vector store
+    writer_env = dict(os.environ, BACKEND_ROLE="writer")
+    writer = subprocess.Popen([sys.executable, os.path.join(SRC_DIR, 'ingest_worker.py')],
+                              env=writer_env)
+
+    # Workers inherit the role; it must be set before endpoint is imported
+    os.environ["BACKEND_ROLE"] = "reader"
+    # The LLM gateway splits its limits between the workers
+    os.environ["BACKEND_WORKERS"] = str(workers)
+    try:
+        uvicorn.run("endpoint:app", host=host, port=port, workers=workers, app_dir=SRC_DIR)
+    finally:
+        writer.terminate()
+        writer.wait()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.workers > 1:
+        run_multi_worker(args.host, args.port, args.workers)
+    else:
+        import uvicorn
+        # Import from src
+        from endpoint import app
+        uvicorn.run(app, host=args.host, port=args.port)
@@ -1,16 +1,32 @@
 """
 Constitution Study Chatbot - Source Package
+
+Public names are resolved lazily (PEP 562) so that importing the package
+does not pull in torch, transformers, chromadb or llama_index.
 """
 
-from .model import setup_chat_engine, create_vector_store_and_index, setup_chroma_collection, chat_with_memory
-from .ingest import create_collection_from_pdf
-from .utils import clean_text_arabic
-
-__all__ = [
-    'setup_chat_engine',
-    'create_vector_store_and_index',
-    'setup_chroma_collection',
-    'chat_with_memory',
-    'create_collection_from_pdf',
-    'clean_text_arabic',
-]
+import importlib
+
+_LAZY_ATTRS = {
+    'setup_chat_engine': '.model',
+    'create_vector_store_and_index': '.model',
+    'setup_chroma_collection': '.model',
+    'chat_with_memory': '.model',
+    'create_collection_from_pdf': '.ingest',
+    'clean_text_arabic': '.utils',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
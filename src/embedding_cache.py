@@ -0,0 +1,235 @@
+"""
+Query-embedding cache and warm-up
+Keeps one embedding model per process, caches query embeddings and
+snapshots them to disk as a memory-mapped NumPy array
+"""
+
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+embedding_model_name = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+_root_dir = os.path.join(os.path.dirname(__file__), '..')
+warmup_questions_path = os.getenv(
+    "WARMUP_QUESTIONS_FILE", os.path.join(_root_dir, 'config', 'warmup_questions.txt'))
+snapshot_dir = os.getenv(
+    "EMBEDDING_SNAPSHOT_DIR", os.path.join(_root_dir, 'data', 'embedding_snapshot'))
+warmup_batches = int(os.getenv("EMBEDDING_WARMUP_BATCHES", "2"))
+warmup_batch_size = int(os.getenv("EMBEDDING_WARMUP_BATCH_SIZE", "8"))
+# Upper bound on runtime (non-snapshot) entries kept in process memory
+query_cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "10000"))
+
+SNAPSHOT_KEYS_FILE = "keys.json"
+SNAPSHOT_VECTORS_FILE = "vectors.npy"
+
+
+class QueryEmbeddingCache:
+    """Thread-safe map from query text to its embedding.
+
+    Entries loaded from a snapshot stay in a read-only memory-mapped array;
+    entries added at runtime are kept in an LRU of at most `max_entries`
+    until the next snapshot.
+    An optional shared backend (see `shared_cache.SharedCache`) lets worker
+    processes reuse each other's embeddings.
+    """
+
+    def __init__(self, max_entries=None):
+        self._lock = threading.Lock()
+        self._snapshot_rows = {}
+        self._snapshot_vectors = None
+        self._new_entries = OrderedDict()
+        self.max_entries = query_cache_size if max_entries is None else max_entries
+        self._shared = None
+
+    def attach_shared(self, shared):
+        """Use `shared` as a second-level cache behind the in-process entries."""
+        self._shared = shared
+
+    def __len__(self):
+        with self._lock:
+            return len(self._snapshot_rows) + len(self._new_entries)
+
+    def __contains__(self, text):
+        with self._lock:
+            return text in self._new_entries or text in self._snapshot_rows
+
+    def _remember(self, text, embedding):
+        # Caller holds the lock
+        self._new_entries[text] = embedding
+        self._new_entries.move_to_end(text)
+        while len(self._new_entries) > self.max_entries:
+            self._new_entries.popitem(last=False)
+
+    def get(self, text):
+        with self._lock:
+            embedding = self._new_entries.get(text)
+            if embedding is not None:
+                self._new_entries.move_to_end(text)
+                return embedding
+            row = self._snapshot_rows.get(text)
+            if row is not None:
+                return self._snapshot_vectors[row].tolist()
+        if self._shared is None:
+            return None
+        embedding = self._shared.get_embedding(text)
+        if embedding is not None:
+            with self._lock:
+                self._remember(text, embedding)
+        return embedding
+
+    def put(self, text, embedding):
+        with self._lock:
+            if text not in self._snapshot_rows:
+                self._remember(text, list(embedding))
+        if self._shared is not None:
+            self._shared.set_embedding(text, embedding)
+
+    @property
+    def dirty(self):
+        with self._lock:
+            return bool(self._new_entries)
+
+    def load_snapshot(self, path, model_name=embedding_model_name):
+        """Memory-map a snapshot written by `save_snapshot`. Returns True on success."""
+        import numpy as np
+
+        keys_path = os.path.join(path, SNAPSHOT_KEYS_FILE)
+        vectors_path = os.path.join(path, SNAPSHOT_VECTORS_FILE)
+        if not (os.path.exists(keys_path) and os.path.exists(vectors_path)):
+            return False
+
+        with open(keys_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != model_name:
+            logger.warning(f"Ignoring embedding snapshot for model {meta.get('model')!r}")
+            return False
+
+        vectors = np.load(vectors_path, mmap_mode="r")
+        keys = meta.get("keys", [])
+        if len(keys) != vectors.shape[0]:
+            logger.warning("Ignoring embedding snapshot: key/vector count mismatch")
+            return False
+
+        with self._lock:
+            self._snapshot_vectors = vectors
+            self._snapshot_rows = {key: row for row, key in enumerate(keys)}
+        return True
+
+    def save_snapshot(self, path, model_name=embedding_model_name):
+        """Write all entries to `path`, replacing any previous snapshot atomically."""
+        import numpy as np
+
+        with self._lock:
+            keys = list(self._snapshot_rows) + list(self._new_entries)
+            rows = []
+            if self._snapshot_vectors is not None:
+                rows.extend(self._snapshot_vectors)
+            rows.extend(self._new_entries.values())
+        if not keys:
+            return
+
+        os.makedirs(path, exist_ok=True)
+        vectors = np.asarray(rows, dtype=np.float32)
+        tmp_vectors = os.path.join(path, f".{SNAPSHOT_VECTORS_FILE}.{os.getpid()}.tmp")
+        tmp_keys = os.path.join(path, f".{SNAPSHOT_KEYS_FILE}.{os.getpid()}.tmp")
+        with open(tmp_vectors, "wb") as f:
+            np.save(f, vectors)
+        with open(tmp_keys, "w", encoding="utf-8") as f:
+            json.dump({"model": model_name, "keys": keys}, f, ensure_ascii=False)
+        # Vectors first: a reader that sees the new keys also sees matching vectors
+        os.replace(tmp_vectors, os.path.join(path, SNAPSHOT_VECTORS_FILE))
+        os.replace(tmp_keys, os.path.join(path, SNAPSHOT_KEYS_FILE))
+
+        self.load_snapshot(path, model_name)
+        with self._lock:
+            self._new_entries = OrderedDict(
+                (text, embedding) for text, embedding in self._new_entries.items()
+                if text not in self._snapshot_rows
+            )
+
+
+query_embedding_cache = QueryEmbeddingCache()
+
+
+def load_snapshot_embeddings(path=None):
+    """Return the snapshot's query embeddings as a read-only array, or None."""
+    snapshot = QueryEmbeddingCache()
+    if not snapshot.load_snapshot(path or snapshot_dir):
+        return None
+    return snapshot._snapshot_vectors
+
+
+_embed_model = None
+_embed_model_lock = threading.Lock()
+
+
+def get_embed_model():
+    """Return the process-wide HuggingFace embedding model, loading it on first use."""
+    global _embed_model
+    if _embed_model is not None:
+        return _embed_model
+
+    with _embed_model_lock:
+        if _embed_model is None:
+            from llama_index.embeddings.huggingface import HuggingFaceEmbedding
+
+            class CachedHuggingFaceEmbedding(HuggingFaceEmbedding):
+                """HuggingFaceEmbedding that consults the query-embedding cache."""
+
+                def _get_query_embedding(self, query):
+                    embedding = query_embedding_cache.get(query)
+                    if embedding is None:
+                        embedding = super()._get_query_embedding(query)
+                        query_embedding_cache.put(query, embedding)
+                    return embedding
+
+                async def _aget_query_embedding(self, query):
+                    return self._get_query_embedding(query)
+
+            _embed_model = CachedHuggingFaceEmbedding(model_name=embedding_model_name)
+    return _embed_model
+
+
+def load_warmup_questions(path=None):
+    """Read frequent questions, one per line; blank lines and `#` comments are skipped."""
+    path = path or warmup_questions_path
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def warm_up(questions=None, batches=None, batch_size=None, snapshot_path=None):
+    """Load the model, run warm-up batches and pre-embed frequent questions.
+
+    Questions already present in the on-disk snapshot are not re-embedded;
+    the snapshot is rewritten only when new embeddings were computed.
+    """
+    questions = load_warmup_questions() if questions is None else questions
+    batches = warmup_batches if batches is None else batches
+    batch_size = warmup_batch_size if batch_size is None else batch_size
+    snapshot_path = snapshot_path or snapshot_dir
+
+    if query_embedding_cache.load_snapshot(snapshot_path):
+        logger.info(f"Loaded {len(query_embedding_cache)} cached query embeddings from snapshot")
+
+    embed_model = get_embed_model()
+
+    # The first forward passes are slow (lazy kernel init); pay for them here
+    sample = (questions or ["warm-up"])[:batch_size]
+    for _ in range(batches):
+        embed_model.get_text_embedding_batch(sample)
+
+    for question in questions:
+        if question not in query_embedding_cache:
+            embed_model.get_query_embedding(question)
+
+    if query_embedding_cache.dirty:
+        query_embedding_cache.save_snapshot(snapshot_path)
+        logger.info(f"Saved {len(query_embedding_cache)} query embeddings to {snapshot_path}")
@@ -1,11 +1,20 @@
 import os
 import sys
 import logging
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, File, UploadFile, HTTPException, Query
 from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from model import setup_chat_engine, create_vector_store_and_index, setup_chroma_collection, chat_with_memory
+from fastapi.concurrency import run_in_threadpool
+from model import setup_chat_engine, get_query_index, chat_with_memory, configure_google_api_key, collection_name
 from ingest import create_collection_from_pdf
+from ingest_worker import enqueue_pdf, wait_for_result
+from embedding_cache import warm_up, query_embedding_cache
+from llm_gateway import LLMTimeoutError, LLMUnavailableError
+from shared_cache import get_shared_cache
+from vector_store import backend_role, get_index_version
+from index_maintenance import compact, report
 from toon_parser import serialize_toon, parse_toon
 from toon_middleware import TOONMiddleware
 
@@ -13,7 +22,38 @@ from toon_middleware import TOONMiddleware
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Fail fast on missing configuration when the worker starts,
+    # instead of at import time
+    configure_google_api_key()
+
+    # Answer and query-embedding cache hits are shared by all workers
+    query_embedding_cache.attach_shared(get_shared_cache())
+
+    # Warm up the embedding model in the background; /ready reports when done
+    app.state.ready = False
+    app.state.warmup_error = None
+
+    def on_warmup_done(task):
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Embedding warm-up failed: {error}", exc_info=error)
+            app.state.warmup_error = str(error)
+        else:
+            logger.info("Embedding warm-up finished")
+            app.state.ready = True
+
+    warmup_task = asyncio.get_running_loop().run_in_executor(None, warm_up)
+    warmup_task.add_done_callback(on_warmup_done)
+    yield
+    warmup_task.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add TOON middleware
 app.add_middleware(TOONMiddleware)
@@ -27,16 +67,58 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/ready")
+async def ready():
+    # Readiness probe: only ready once the embedding warm-up has finished
+    is_ready = getattr(app.state, "ready", False)
+    toon_response = serialize_toon({
+        "ready": is_ready,
+        "error": getattr(app.state, "warmup_error", None),
+    })
+    return Response(content=toon_response, media_type="application/toon",
+                    status_code=200 if is_ready else 503)
+
+
+def answer_query(query_request):
+    # Blocking work (cache, retrieval, LLM gateway); runs in the threadpool
+    # so concurrent requests can be coalesced instead of serialized
+
+    # Answers are keyed by index version so a new ingestion invalidates them
+    shared_cache = get_shared_cache()
+    cache_key = f"{get_index_version()}:{collection_name}:{query_request.strip()}"
+    response = shared_cache.get_answer(cache_key)
+    if response is not None:
+        logger.info("Answer cache hit")
+        return response
+
+    # The same question in flight on another worker: wait for its answer
+    claimed = shared_cache.claim(cache_key)
+    if not claimed:
+        response = shared_cache.wait_for_answer(cache_key)
+        if response is not None:
+            logger.info("Coalesced with an in-flight question on another worker")
+            return response
+        # That worker failed or gave up; answer it here
+        claimed = shared_cache.claim(cache_key)
+
+    try:
+        index = get_query_index()
+        chat_engine, chat_history = setup_chat_engine(index)
+
+        response = str(chat_with_memory(chat_engine, chat_history, query_request))
+        shared_cache.set_answer(cache_key, response)
+    finally:
+        if claimed:
+            shared_cache.release(cache_key)
+    logger.info(f"Response generated: {response}")
+    return response
+
+
 @app.get("/chat")
 async def chat_with_pdf(query_request: str = Query(...)):
     try:
         logger.info(f"Received query: {query_request}")
-        chroma_collection = setup_chroma_collection()
-        index = create_vector_store_and_index(chroma_collection)
-        chat_engine, chat_history = setup_chat_engine(index)
-
-        response = chat_with_memory(chat_engine, chat_history, query_request)
-        logger.info(f"Response generated: {response}")
+        response = await run_in_threadpool(answer_query, query_request)
         
         # Convert response to TOON format
         toon_response = serialize_toon({
@@ -53,11 +135,20 @@ async def chat_with_pdf(query_request: str = Query(...)):
             "error": str(e),
             "message": "Failed to process query"
         })
-        return Response(content=error_toon, media_type="application/toon", status_code=500)
+        if isinstance(e, LLMTimeoutError):
+            status_code = 504
+        elif isinstance(e, LLMUnavailableError):
+            status_code = 503
+        else:
+            status_code = 500
+        return Response(content=error_toon, media_type="application/toon", status_code=status_code)
 
 
 @app.post("/upload_pdf/")
 async def upload_pdf(file: UploadFile = File(...)):
+    if backend_role == "reader":
+        return await queue_pdf_for_writer(file)
+
     # Save the uploaded PDF file to a temporary location
     pdf_file_path = f"./temp/{file.filename}"  # Temporary path for the uploaded file
     try:
@@ -89,3 +180,75 @@ async def upload_pdf(file: UploadFile = File(...)):
         # Ensure the temporary file is removed in case of an error
         if os.path.exists(pdf_file_path):
             os.remove(pdf_file_path)
+
+
+@app.post("/index/compact")
+async def compact_index(collection: str = Query(collection_name), dry_run: bool = Query(False)):
+    # Compaction writes to the store, so it belongs to the ingestion writer
+    if backend_role == "reader":
+        error_toon = serialize_toon({
+            "success": False,
+            "error": "Read-only query worker",
+            "message": f"Run 'python manage_index.py compact {collection}' on the ingestion host"
+        })
+        return Response(content=error_toon, media_type="application/toon", status_code=409)
+    try:
+        summary = await run_in_threadpool(compact, collection, dry_run)
+        toon_response = serialize_toon({
+            "success": True,
+            "summary": summary,
+            "message": "Collection compacted successfully"
+        })
+        return Response(content=toon_response, media_type="application/toon")
+    except Exception as e:
+        logger.error(f"Error in /index/compact endpoint: {str(e)}", exc_info=True)
+        error_toon = serialize_toon({
+            "success": False,
+            "error": str(e),
+            "message": "Failed to compact collection"
+        })
+        return Response(content=error_toon, media_type="application/toon", status_code=500)
+
+
+@app.get("/index/report")
+async def index_report(collection: str = Query(collection_name), k: int = Query(5, ge=1),
+                       queries: int = Query(100, ge=1)):
+    try:
+        result = await run_in_threadpool(report, collection, k, queries)
+        toon_response = serialize_toon({
+            "success": True,
+            "report": result,
+            "message": "Index report generated successfully"
+        })
+        return Response(content=toon_response, media_type="application/toon")
+    except Exception as e:
+        logger.error(f"Error in /index/report endpoint: {str(e)}", exc_info=True)
+        error_toon = serialize_toon({
+            "success": False,
+            "error": str(e),
+            "message": "Failed to generate index report"
+        })
+        return Response(content=error_toon, media_type="application/toon", status_code=500)
+
+
+async def queue_pdf_for_writer(file: UploadFile):
+    # Read-only query workers hand uploads to the single ingestion writer
+    try:
+        job_id = enqueue_pdf(await file.read(), file.filename)
+        result = await wait_for_result(job_id)
+        if not result.get("success"):
+            raise RuntimeError(result.get("error", "Ingestion failed"))
+
+        toon_response = serialize_toon({
+            "success": True,
+            "message": result["message"]
+        })
+
+        return Response(content=toon_response, media_type="application/toon", status_code=200)
+    except Exception as e:
+        error_toon = serialize_toon({
+            "success": False,
+            "error": str(e),
+            "message": "Failed to upload and process PDF"
+        })
+        return Response(content=error_toon, media_type="application/toon", status_code=500)
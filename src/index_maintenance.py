@@ -0,0 +1,96 @@
+"""
+Vector index maintenance
+Compaction, quantized index builds and size/recall reports, shared by the
+manage_index.py command and the /index endpoints
+"""
+
+import os
+import logging
+from vector_store import open_collection, compact_collection, persist_chroma_client, get_chroma_client
+from quantized_index import (
+    QuantizedIndex, build_and_save, collection_index_path, recall_report, META_FILE,
+    vector_index_backend,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def has_quantized_index(name):
+    return os.path.exists(os.path.join(collection_index_path(name), META_FILE))
+
+
+def refresh_quantized_index(collection):
+    """Rebuild a collection's quantized index after its data changed.
+
+    Keeps the parameters of the existing index; builds one with defaults
+    when VECTOR_INDEX=quantized and none exists yet.
+    """
+    if has_quantized_index(collection.name):
+        previous = QuantizedIndex.load(collection_index_path(collection.name))
+        build_and_save(collection, quantization=previous.quantization, ann=previous.ann,
+                       hnsw_m=previous.hnsw_m, ef_construction=previous.ef_construction,
+                       ef_search=previous.ef_search, rescore_factor=previous.rescore_factor,
+                       ivf_lists=previous.ivf_lists, ivf_probe=previous.ivf_probe)
+    elif vector_index_backend == "quantized":
+        build_and_save(collection)
+
+
+def compact(name, dry_run=False):
+    """Compact a collection, refresh its quantized index and publish the change."""
+    collection = open_collection(name)
+    summary = compact_collection(collection, dry_run=dry_run)
+    removed = summary["duplicates"] + summary["orphans"]
+    if removed and not dry_run:
+        refresh_quantized_index(collection)
+        # Bump the index version last so readers reload a consistent state
+        persist_chroma_client(get_chroma_client())
+    logger.info(f"Compacted '{name}': {summary}")
+    return summary
+
+
+def quantize(name, quantization="int8", ann="ivf", hnsw_m=16, ef_construction=200,
+             ef_search=64, rescore_factor=4, ivf_lists=None, ivf_probe=32):
+    """Build and save the quantized index of a collection; returns its size report."""
+    index = build_and_save(
+        open_collection(name), quantization=quantization, ann=ann, hnsw_m=hnsw_m,
+        ef_construction=ef_construction, ef_search=ef_search, rescore_factor=rescore_factor,
+        ivf_lists=ivf_lists, ivf_probe=ivf_probe)
+    # Query workers pick the new index up on the next version check
+    persist_chroma_client(get_chroma_client())
+    return index.size_report()
+
+
+def report(name, k=5, num_queries=100, **build_kwargs):
+    """Size and recall-vs-exact report for a collection.
+
+    Uses the saved quantized index when present, otherwise builds one in
+    memory with `build_kwargs` (nothing is written). Recall is measured with
+    the real query embeddings of the warm-up snapshot when they match the
+    index dimension, and leave-one-out over stored vectors otherwise.
+    """
+    from quantized_index import build_from_collection
+    from embedding_cache import load_snapshot_embeddings
+
+    collection = open_collection(name)
+    if has_quantized_index(name) and not build_kwargs:
+        index = QuantizedIndex.load(collection_index_path(name))
+    else:
+        index = build_from_collection(collection, **build_kwargs)
+
+    queries = load_snapshot_embeddings()
+    if queries is not None and len(index) and queries.shape[1] != index.codes.shape[1]:
+        queries = None
+
+    return {
+        "collection": name,
+        "chroma_count": collection.count(),
+        "quantization": index.quantization,
+        "ann": index.ann,
+        "hnsw_m": index.hnsw_m,
+        "ef_search": index.ef_search,
+        "rescore_factor": index.rescore_factor,
+        "ivf_lists": len(index.ivf[0]) if index.ivf is not None else None,
+        "ivf_probe": index.ivf_probe,
+        "size": index.size_report(),
+        "recall": recall_report(index, k=k, num_queries=num_queries, queries=queries),
+    }
@@ -1,17 +1,19 @@
 import os
 import sys
-from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, StorageContext
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-import chromadb
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from chromadb.utils import embedding_functions
 from utils import clean_text_arabic
+from embedding_cache import get_embed_model
+from vector_store import get_chroma_client, get_chroma_embedding_function, persist_chroma_client
+from index_maintenance import refresh_quantized_index
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def create_collection_from_pdf(pdf_file_path):
+def create_collection_from_pdf(pdf_file_path, collection_name=None):
+    # Heavy dependencies are imported lazily to keep module import cheap
+    from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, StorageContext
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+
     # Load documents from the PDF file
     reader = SimpleDirectoryReader(input_files=[pdf_file_path])
     documents = reader.load_data()
@@ -20,23 +22,18 @@ def create_collection_from_pdf(pdf_file_path):
     for document in documents:
         document.text = clean_text_arabic(document.text)
 
-    huggingface_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-    )
-
-    # Initialize ChromaDB client and create a collection
-    db = chromadb.Client()
-    collection_name = os.path.splitext(os.path.basename(pdf_file_path))[0]  # Use the file name without extension
+    # Open the persistent ChromaDB client and create a collection
+    db = get_chroma_client()
+    if collection_name is None:
+        collection_name = os.path.splitext(os.path.basename(pdf_file_path))[0]  # Use the file name without extension
     
     chroma_collection = db.get_or_create_collection(
         name=collection_name, 
-        embedding_function=huggingface_ef
+        embedding_function=get_chroma_embedding_function()
     )
 
-    # Create an embedding model
-    embed_model = HuggingFaceEmbedding(
-        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-    )
+    # Reuse the process-wide embedding model
+    embed_model = get_embed_model()
 
     # Initialize vector store and storage context
     vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
@@ -45,4 +42,10 @@ def create_collection_from_pdf(pdf_file_path):
     # Create a VectorStoreIndex from the documents
     VectorStoreIndex.from_documents(documents, storage_context=storage_context, embed_model=embed_model)
 
+    # Keep the quantized index (if any) in sync before publishing the change
+    refresh_quantized_index(chroma_collection)
+
+    # Flush to disk and let query workers pick up the new data
+    persist_chroma_client(db)
+
     print(f"Collection '{collection_name}' created successfully with {len(documents)} documents.")
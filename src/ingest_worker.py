@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Ingestion writer for multi-worker mode
+Read-only query workers drop uploaded PDFs into a spool directory; this
+single writer process ingests them into the persistent vector store and
+writes a result file per job
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+ingest_queue_dir = os.getenv(
+    "INGEST_QUEUE_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'ingest_queue'))
+ingest_timeout = float(os.getenv("INGEST_TIMEOUT", "600"))
+poll_interval = float(os.getenv("INGEST_POLL_INTERVAL", "0.5"))
+
+PENDING_DIR = "pending"
+RESULTS_DIR = "results"
+
+
+def _queue_path(*parts):
+    return os.path.join(ingest_queue_dir, *parts)
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def enqueue_pdf(content, filename):
+    """Spool an uploaded PDF for the writer and return its job id."""
+    os.makedirs(_queue_path(PENDING_DIR), exist_ok=True)
+    job_id = uuid.uuid4().hex
+    _write_json(_queue_path(PENDING_DIR, f"{job_id}.json"), {
+        "collection_name": os.path.splitext(os.path.basename(filename))[0],
+        "filename": filename,
+    })
+    pdf_path = _queue_path(PENDING_DIR, f"{job_id}.pdf")
+    with open(f"{pdf_path}.tmp", "wb") as f:
+        f.write(content)
+    # The writer only picks up *.pdf, so the rename publishes the job
+    os.replace(f"{pdf_path}.tmp", pdf_path)
+    return job_id
+
+
+async def wait_for_result(job_id, timeout=None):
+    """Wait for the writer to finish `job_id` and return its result dict."""
+    timeout = ingest_timeout if timeout is None else timeout
+    result_path = _queue_path(RESULTS_DIR, f"{job_id}.json")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(result_path):
+            with open(result_path, encoding="utf-8") as f:
+                result = json.load(f)
+            os.remove(result_path)
+            return result
+        await asyncio.sleep(poll_interval)
+    raise TimeoutError(f"Ingestion job {job_id} did not finish within {timeout:.0f}s")
+
+
+def process_pending_jobs():
+    """Ingest every spooled PDF in arrival order. Returns the number of jobs handled."""
+    from ingest import create_collection_from_pdf
+
+    pending_dir = _queue_path(PENDING_DIR)
+    if not os.path.isdir(pending_dir):
+        return 0
+    os.makedirs(_queue_path(RESULTS_DIR), exist_ok=True)
+
+    jobs = sorted(
+        (entry for entry in os.scandir(pending_dir) if entry.name.endswith(".pdf")),
+        key=lambda entry: entry.stat().st_mtime,
+    )
+    for entry in jobs:
+        job_id = entry.name[:-len(".pdf")]
+        meta_path = _queue_path(PENDING_DIR, f"{job_id}.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            create_collection_from_pdf(entry.path, collection_name=meta["collection_name"])
+            result = {
+                "success": True,
+                "message": f"Collection created from '{meta['filename']}' successfully.",
+            }
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} failed: {str(e)}", exc_info=True)
+            result = {"success": False, "error": str(e)}
+        _write_json(_queue_path(RESULTS_DIR, f"{job_id}.json"), result)
+        for path in (entry.path, meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+    return len(jobs)
+
+
+def run_ingest_worker():
+    """Poll the spool directory forever, ingesting jobs as they arrive."""
+    logger.info(f"Ingestion writer watching {ingest_queue_dir}")
+    while True:
+        if not process_pending_jobs():
+            time.sleep(poll_interval)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        run_ingest_worker()
+    except KeyboardInterrupt:
+        pass
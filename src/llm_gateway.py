@@ -0,0 +1,355 @@
+"""
+LLM gateway
+Single-flight deduplication, client-side rate/concurrency limits, per-call
+timeouts and retry with jittered backoff around calls to the LLM
+"""
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+# "gemini" (default), "mock" (llama_index's local MockLLM, no API key needed)
+# or any name added with register_llm_backend()
+llm_backend = os.getenv("LLM_BACKEND", "gemini")
+llm_model_name = os.getenv("LLM_MODEL", "models/gemini-2.5-flash")
+# Set by run_backend.py: number of query workers sharing the upstream limits
+backend_workers = max(1, int(os.getenv("BACKEND_WORKERS", "1")))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted",
+    "TooManyRequests",
+    "ServiceUnavailable",
+    "DeadlineExceeded",
+    "InternalServerError",
+}
+
+
+class LLMTimeoutError(TimeoutError):
+    """The call did not finish within its deadline (never retried)."""
+
+
+class LLMUnavailableError(RuntimeError):
+    """The upstream call kept failing with retryable errors."""
+
+
+def is_retryable(error):
+    """Return True for transient errors (rate limits, timeouts, 5xx)."""
+    if isinstance(error, LLMTimeoutError):
+        # The abandoned upstream call may still be running; retrying would
+        # stack another call on top of it
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    for attr in ("code", "status_code"):
+        code = getattr(error, attr, None)
+        if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+            return True
+    return False
+
+
+class _RateLimiter:
+    """Token bucket allowing `rate` calls per second with bursts of `burst`."""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = max(1.0, float(burst or rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Take one token, waiting at most until `deadline` (monotonic). Returns success."""
+        if self.rate <= 0:
+            return True
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if deadline is not None:
+                if now + wait > deadline:
+                    return False
+            time.sleep(wait)
+
+
+class _SharedRateLimiter:
+    """Token bucket kept in the shared SQLite cache, so the rate holds across workers."""
+
+    def __init__(self, shared, rate, burst=None, name="llm"):
+        self.shared = shared
+        self.rate = rate
+        self.capacity = max(1.0, float(burst or rate))
+        self.name = name
+
+    def acquire(self, deadline=None):
+        """Take one token, waiting at most until `deadline` (monotonic). Returns success."""
+        if self.rate <= 0:
+            return True
+        while True:
+            wait = self.shared.take_token(self.name, self.rate, self.capacity)
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class LLMGateway:
+    """Wraps blocking LLM calls so bursts do not collapse on upstream rate limits.
+
+    Concurrent calls with the same key share one upstream call; the others
+    wait for its result (single-flight). `timeout` is one deadline covering
+    queueing, every attempt and the backoff sleeps in between.
+    """
+
+    def __init__(self, max_concurrency=4, rate_limit=2.0, max_retries=3,
+                 backoff_base=0.5, backoff_max=8.0, timeout=60.0, rate_limiter=None):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        # `rate_limiter` replaces the per-process bucket (e.g. _SharedRateLimiter)
+        self._rate_limiter = rate_limiter or _RateLimiter(rate_limit)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency,
+                                            thread_name_prefix="llm-gateway")
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def call(self, key, fn, timeout=None):
+        """Return `fn()`, sharing the result with concurrent calls for the same `key`."""
+        with self._inflight_lock:
+            inflight = self._inflight.get(key)
+            is_leader = inflight is None
+            if is_leader:
+                inflight = self._inflight[key] = _InFlightCall()
+
+        if not is_leader:
+            logger.info("Coalesced duplicate in-flight LLM request")
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.result
+
+        try:
+            inflight.result = self._call_with_retries(fn, timeout)
+            return inflight.result
+        except BaseException as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(key, None)
+            inflight.done.set()
+
+    def _call_with_retries(self, fn, timeout):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout if timeout else None
+        attempt = 0
+        while True:
+            try:
+                return self._call_once(fn, deadline, timeout)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                if attempt >= self.max_retries:
+                    raise LLMUnavailableError(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                # Full jitter: sleep uniformly in [0, min(cap, base * 2^attempt)]
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise LLMTimeoutError(
+                        f"LLM call timed out after {timeout:g}s ({attempt + 1} attempts, last: {e})") from e
+                logger.warning(f"Retryable LLM error ({type(e).__name__}: {e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                attempt += 1
+
+    def _remaining(self, deadline, timeout):
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:g}s")
+        return remaining
+
+    def _call_once(self, fn, deadline, timeout):
+        if not self._rate_limiter.acquire(deadline):
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:g}s waiting for the rate limit")
+        remaining = self._remaining(deadline, timeout)
+        acquired = (self._semaphore.acquire(timeout=remaining) if remaining is not None
+                    else self._semaphore.acquire())
+        if not acquired:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:g}s waiting for a free slot")
+        try:
+            remaining = self._remaining(deadline, timeout)
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        # Keep the slot until the upstream call really ends, even after a timeout
+        future.add_done_callback(lambda _: self._semaphore.release())
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:g}s") from None
+
+
+def _messages_key(messages):
+    return "\n".join(f"{message.role}: {message.content}" for message in messages)
+
+
+_gateway_llm_class = None
+
+
+def wrap_llm(llm, gateway=None):
+    """Return a llama_index LLM that sends `llm`'s chat/complete calls through the gateway.
+
+    Only these stateless calls are coalesced, rate limited and retried, so a
+    retry resends exactly the same messages; chat engines keep their memory
+    and retrieval outside of it. Streaming calls are passed through.
+    """
+    global _gateway_llm_class
+    if _gateway_llm_class is None:
+        import asyncio
+        from typing import Any
+        from pydantic import PrivateAttr
+        from llama_index.core.llms import LLM
+
+        class GatewayLLM(LLM):
+            """Delegates to another LLM through an LLMGateway."""
+
+            _llm: Any = PrivateAttr()
+            _gateway: Any = PrivateAttr()
+
+            def __init__(self, llm, gateway):
+                super().__init__(callback_manager=llm.callback_manager)
+                self._llm = llm
+                self._gateway = gateway
+
+            @classmethod
+            def class_name(cls):
+                return "GatewayLLM"
+
+            @property
+            def metadata(self):
+                return self._llm.metadata
+
+            def chat(self, messages, **kwargs):
+                return self._gateway.call(
+                    f"chat:{_messages_key(messages)}", lambda: self._llm.chat(messages, **kwargs))
+
+            def complete(self, prompt, formatted=False, **kwargs):
+                return self._gateway.call(
+                    f"complete:{prompt}",
+                    lambda: self._llm.complete(prompt, formatted=formatted, **kwargs))
+
+            def stream_chat(self, messages, **kwargs):
+                return self._llm.stream_chat(messages, **kwargs)
+
+            def stream_complete(self, prompt, formatted=False, **kwargs):
+                return self._llm.stream_complete(prompt, formatted=formatted, **kwargs)
+
+            async def achat(self, messages, **kwargs):
+                return await asyncio.to_thread(self.chat, messages, **kwargs)
+
+            async def acomplete(self, prompt, formatted=False, **kwargs):
+                return await asyncio.to_thread(self.complete, prompt, formatted, **kwargs)
+
+            async def astream_chat(self, messages, **kwargs):
+                return await self._llm.astream_chat(messages, **kwargs)
+
+            async def astream_complete(self, prompt, formatted=False, **kwargs):
+                return await self._llm.astream_complete(prompt, formatted=formatted, **kwargs)
+
+        _gateway_llm_class = GatewayLLM
+    return _gateway_llm_class(llm, gateway or get_llm_gateway())
+
+
+def _create_gemini():
+    from llama_index.llms.gemini import Gemini
+    return Gemini(model=llm_model_name, temperature=0)
+
+
+def _create_mock():
+    from llama_index.core.llms import MockLLM
+    return MockLLM(max_tokens=int(os.getenv("MOCK_LLM_MAX_TOKENS", "64")))
+
+
+_llm_backends = {"gemini": _create_gemini, "mock": _create_mock}
+
+
+def register_llm_backend(name, factory):
+    """Make `factory()` (returning a llama_index LLM) selectable as LLM_BACKEND=`name`."""
+    _llm_backends[name] = factory
+
+
+def create_llm(backend=None):
+    """Create the LLM of `backend` (default: LLM_BACKEND)."""
+    backend = backend or llm_backend
+    factory = _llm_backends.get(backend)
+    if factory is None:
+        raise ValueError(f"Unknown LLM backend {backend!r}, expected one of {sorted(_llm_backends)}")
+    return factory()
+
+
+_llm = None
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm():
+    """Return the process-wide LLM (stateless, shared by all requests), wrapped by the gateway."""
+    global _llm
+    if _llm is None:
+        gateway = get_llm_gateway()
+        with _gateway_lock:
+            if _llm is None:
+                _llm = wrap_llm(create_llm(), gateway)
+    return _llm
+
+
+def get_llm_gateway():
+    """Return the process-wide LLMGateway configured from the environment.
+
+    LLM_MAX_CONCURRENCY and LLM_RATE_LIMIT are totals for the deployment:
+    with several workers the concurrency cap is split between them and the
+    rate limit is one token bucket in the shared SQLite cache.
+    """
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                rate_limit = float(os.getenv("LLM_RATE_LIMIT", "2"))
+                rate_limiter = None
+                if backend_workers > 1:
+                    from shared_cache import get_shared_cache
+                    rate_limiter = _SharedRateLimiter(get_shared_cache(), rate_limit)
+                _gateway = LLMGateway(
+                    max_concurrency=max(
+                        1, int(os.getenv("LLM_MAX_CONCURRENCY", "4")) // backend_workers),
+                    rate_limit=rate_limit,
+                    rate_limiter=rate_limiter,
+                    max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+                    backoff_base=float(os.getenv("LLM_BACKOFF_BASE", "0.5")),
+                    backoff_max=float(os.getenv("LLM_BACKOFF_MAX", "8")),
+                    timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+                )
+    return _gateway
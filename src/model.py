@@ -1,14 +1,16 @@
 import os
 import sys
-import chromadb
-from chromadb.utils import embedding_functions
-from llama_index.core import StorageContext, VectorStoreIndex, PromptTemplate, Settings
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
-from llama_index.vector_stores.chroma import ChromaVectorStore
-from llama_index.llms.gemini import Gemini
-from llama_index.core.chat_engine import SimpleChatEngine
-from llama_index.core.llms import ChatMessage, MessageRole
 from dotenv import load_dotenv
+import threading
+from embedding_cache import get_embed_model
+from llm_gateway import get_llm, wrap_llm, llm_backend
+from vector_store import get_chroma_client, get_chroma_embedding_function, get_index_version
+from quantized_index import vector_index_backend, QuantizedIndex, collection_index_path, create_quantized_vector_store
+from index_maintenance import has_quantized_index
+
+# Heavy dependencies (torch, transformers, chromadb, llama_index, the Gemini SDK)
+# are imported inside the functions that use them, so importing this module
+# stays cheap and workers/CLI commands start quickly.
 
 load_dotenv()
 
@@ -19,34 +21,63 @@ if os.path.exists(config_path):
 
 # Initialize constants
 pdf_file_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'constitution.pdf')
-google_api_key = os.getenv("GOOGLE_API_KEY", "")
-if not google_api_key:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables")
-os.environ["GOOGLE_API_KEY"] = google_api_key
 
 collection_name = os.path.splitext(os.path.basename(pdf_file_path))[0]
 
+# "simple" answers from the LLM and the chat history only; "context" first
+# retrieves the relevant chunks from the index and passes them to the LLM
+chat_mode = os.getenv("CHAT_MODE", "simple")
+
+# Function to check the Gemini API key (called at app startup, not import time)
+def configure_google_api_key():
+    """Ensure GOOGLE_API_KEY is set and exported for the Gemini SDK."""
+    if llm_backend != "gemini":
+        # The local stand-in backend does not call Gemini
+        return None
+    google_api_key = os.getenv("GOOGLE_API_KEY", "")
+    if not google_api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+    os.environ["GOOGLE_API_KEY"] = google_api_key
+    return google_api_key
+
 # Function to set up the database and collection
 def setup_chroma_collection():
-    """Initialize ChromaDB client and create a collection."""
-    huggingface_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-    )
-
-    # Initialize ChromaDB client and create a collection
-    db = chromadb.Client()
-    return db.get_or_create_collection(name=collection_name, embedding_function=huggingface_ef)
+    """Open the persistent ChromaDB client and get or create the collection."""
+    db = get_chroma_client()
+    return db.get_or_create_collection(
+        name=collection_name, embedding_function=get_chroma_embedding_function())
 
 # Function to create the vector store and index
 def create_vector_store_and_index(chroma_collection):
     """Create vector store and storage context."""
-    # Create an embedding model (Free & Local)
-    embed_model = HuggingFaceEmbedding(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    # Initialize vector store and storage context
+    if vector_index_backend == "quantized":
+        vector_store = load_quantized_vector_store(chroma_collection.name)
+    else:
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
+    return create_index(vector_store)
+
+# Function to open the memory-mapped quantized store of a collection
+def load_quantized_vector_store(name):
+    """Load the saved quantized index of `name`; it does not need the Chroma store."""
+    if not has_quantized_index(name):
+        raise RuntimeError(
+            f"No quantized index for '{name}'; "
+            f"run: python manage_index.py quantize {name}")
+    return create_quantized_vector_store(QuantizedIndex.load(collection_index_path(name)))
+
+# Function to create the index over a vector store
+def create_index(vector_store):
+    """Create the index from an existing vector store."""
+    from llama_index.core import StorageContext, VectorStoreIndex, Settings
+
+    # Shared embedding model (Free & Local), loaded once per process
+    embed_model = get_embed_model()
 
     Settings.embed_model = embed_model
 
-    # Initialize vector store and storage context
-    vector_store = ChromaVectorStore(chroma_collection=chroma_collection)
     storage_context = StorageContext.from_defaults(vector_store=vector_store)
 
     # Create the index from the existing vector store
@@ -55,16 +86,54 @@ def create_vector_store_and_index(chroma_collection):
 
     return index
 
+_query_index = None
+_query_index_version = None
+_query_index_lock = threading.Lock()
+
+# Function to get the index shared by all requests of this process
+def get_query_index():
+    """Return the cached index, rebuilding it when the persisted store changes."""
+    global _query_index, _query_index_version
+    version = get_index_version()
+    with _query_index_lock:
+        if _query_index is None or version != _query_index_version:
+            if vector_index_backend == "quantized":
+                # Only the collection name is needed: don't load the whole
+                # Chroma store into this worker's memory
+                _query_index = create_index(load_quantized_vector_store(collection_name))
+            else:
+                _query_index = create_vector_store_and_index(setup_chroma_collection())
+            _query_index_version = version
+        return _query_index
+
 # Function to set up the chat engine
-def setup_chat_engine(index):
-    """Initialize the chat engine."""
-    llm = Gemini(model="models/gemini-2.5-flash", temperature=0)
+def setup_chat_engine(index, llm=None):
+    """Initialize the chat engine.
+
+    `llm` replaces the LLM_BACKEND model (e.g. a stand-in in tests); it is
+    wrapped by the gateway as well.
+    """
+    from llama_index.core import Settings
+    from llama_index.core.chat_engine import SimpleChatEngine
+
+    if chat_mode not in ("simple", "context"):
+        raise ValueError(f"Unknown CHAT_MODE '{chat_mode}'; use 'simple' or 'context'")
+    if llm is None:
+        configure_google_api_key()
+        llm = get_llm()
+    else:
+        llm = wrap_llm(llm)
     Settings.llm = llm
     
-    query_engine = index.as_query_engine(llm=llm)
-    
     chat_history = []
 
+    if chat_mode == "context":
+        # Each question is embedded with the index's shared embedding model
+        # (query-embedding cache) and the retrieved chunks go to the LLM
+        return index.as_chat_engine(chat_mode="context", llm=llm), chat_history
+
+    query_engine = index.as_query_engine(llm=llm)
+
     # Set up the chat engine
     chat_engine = SimpleChatEngine.from_defaults(
         query_engine=query_engine,
@@ -76,8 +145,12 @@ def setup_chat_engine(index):
 # Function to handle chat queries
 def chat_with_memory(chat_engine, chat_history, user_query):
     """Process the user's query and update chat history."""
+    from llama_index.core.llms import ChatMessage, MessageRole
+
     chat_history.append(ChatMessage(role=MessageRole.USER, content=user_query))
+    # The engine's LLM is wrapped by the gateway (see get_llm): identical
+    # in-flight prompts share one upstream call, retries resend the same messages
     response = chat_engine.chat(user_query)
     chat_history.append(ChatMessage(
         role=MessageRole.ASSISTANT, content=str(response)))
-    return response
\ No newline at end of file
+    return response
@@ -0,0 +1,520 @@
+"""
+Quantized vector index
+Stores collection embeddings as int8 or float16 codes searched through an
+inverted file (IVF), a flat scan or a local HNSW (hnswlib) graph, then
+re-scores the top candidates against memory-mapped full-precision vectors
+"""
+
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+quantized_index_dir = os.getenv(
+    "QUANTIZED_INDEX_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'quantized_index'))
+# "chroma" (default) or "quantized": which store get_query_index() searches
+vector_index_backend = os.getenv("VECTOR_INDEX", "chroma")
+
+QUANTIZATIONS = ("int8", "float16")
+ANN_TYPES = ("ivf", "flat", "hnsw")
+
+META_FILE = "meta.json"
+RECORDS_FILE = "records.json"
+CODES_FILE = "codes.npy"
+SCALES_FILE = "scales.npy"
+VECTORS_FILE = "vectors.npy"
+HNSW_FILE = "hnsw.bin"
+IVF_CENTROIDS_FILE = "ivf_centroids.npy"
+IVF_ROWS_FILE = "ivf_rows.npy"
+IVF_OFFSETS_FILE = "ivf_offsets.npy"
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors, quantization):
+    """Return (codes, scales) for float32 `vectors`; scales is None for float16."""
+    import numpy as np
+
+    if quantization == "float16":
+        return vectors.astype(np.float16), None
+    if quantization == "int8":
+        if not len(vectors):
+            return vectors.astype(np.int8), np.empty(0, dtype=np.float32)
+        # Symmetric per-vector scale so each row uses the full int8 range
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales = np.maximum(scales, 1e-12).astype(np.float32)
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales
+    raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+
+
+def dequantize(codes, scales):
+    import numpy as np
+
+    if scales is None:
+        return codes.astype(np.float32)
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def default_ivf_lists(count):
+    """Number of inverted lists for `count` vectors (about 4 * sqrt(count))."""
+    return max(1, min(count, int(round(4 * count ** 0.5))))
+
+
+def _assign_lists(vectors, centroids, block_size=8192):
+    import numpy as np
+
+    lists = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        lists[start:start + block_size] = np.argmax(
+            np.asarray(vectors[start:start + block_size]) @ centroids.T, axis=1)
+    return lists
+
+
+def train_ivf(vectors, num_lists, iterations=10, seed=0):
+    """Spherical k-means on a sample of normalized `vectors`.
+
+    Returns (centroids, rows, offsets): the rows of list `i` are
+    `rows[offsets[i]:offsets[i + 1]]`.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    sample_rows = rng.choice(len(vectors), size=min(len(vectors), 64 * num_lists), replace=False)
+    sample = np.asarray(vectors[np.sort(sample_rows)])
+    centroids = sample[rng.choice(len(sample), size=num_lists, replace=False)].copy()
+    for _ in range(iterations):
+        lists = _assign_lists(sample, centroids)
+        counts = np.bincount(lists, minlength=num_lists)
+        sums = np.empty_like(centroids)
+        filled = counts > 0
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums[filled] = np.add.reduceat(sample[np.argsort(lists, kind="stable")], starts[filled], axis=0)
+        # Empty lists restart from random sample rows
+        sums[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+        centroids = _normalize(sums).astype(np.float32)
+
+    lists = _assign_lists(vectors, centroids)
+    rows = np.argsort(lists, kind="stable").astype(np.int32)
+    offsets = np.searchsorted(lists[rows], np.arange(num_lists + 1)).astype(np.int64)
+    return centroids, rows, offsets
+
+
+class QuantizedIndex:
+    """Read-only cosine-similarity index over one collection snapshot.
+
+    Search runs in two stages: candidates are scored on the quantized codes,
+    then the top `rescore_factor * k` are re-ranked with the full-precision
+    vectors, which stay memory-mapped on disk and are only touched for those
+    rows. int8 codes are scored against an int8 copy of the query with
+    int32 accumulation, never dequantized.
+
+    `ann="ivf"` (the default) clusters the vectors into inverted lists and
+    only scores the `ivf_probe` lists closest to the query; besides the codes
+    it keeps the centroids and one int32 row id per vector. `ann="flat"`
+    scores every code. hnswlib holds its own float32 copy of every vector,
+    so `ann="hnsw"` uses more RAM than the float32 store alone.
+    """
+
+    def __init__(self, ids, documents, metadatas, codes, scales, vectors,
+                 quantization="int8", ann="ivf", hnsw=None, hnsw_m=16, ef_construction=200,
+                 ef_search=64, rescore_factor=4, ivf=None, ivf_lists=None, ivf_probe=32):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.codes = codes
+        self.scales = scales
+        self.vectors = vectors
+        self.quantization = quantization
+        self.ann = ann
+        self.hnsw = hnsw
+        self.hnsw_m = hnsw_m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.rescore_factor = rescore_factor
+        # (centroids, rows, offsets) from train_ivf
+        self.ivf = ivf
+        self.ivf_lists = ivf_lists
+        self.ivf_probe = ivf_probe
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, ids, documents, metadatas, embeddings, quantization="int8", ann="ivf",
+              hnsw_m=16, ef_construction=200, ef_search=64, rescore_factor=4,
+              ivf_lists=None, ivf_probe=32):
+        import numpy as np
+
+        if ann not in ANN_TYPES:
+            raise ValueError(f"Unknown ANN type {ann!r}, expected one of {ANN_TYPES}")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if len(vectors):
+            # Normalized in place when `embeddings` is already a float32 array
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        codes, scales = quantize(vectors, quantization)
+
+        hnsw = None
+        if ann == "hnsw" and len(ids):
+            import hnswlib
+
+            hnsw = hnswlib.Index(space="ip", dim=vectors.shape[1])
+            hnsw.init_index(max_elements=len(ids), M=hnsw_m, ef_construction=ef_construction)
+            # The graph is built from the quantized values; re-scoring restores precision
+            hnsw.add_items(_normalize(dequantize(codes, scales)), np.arange(len(ids)))
+            hnsw.set_ef(ef_search)
+
+        ivf = None
+        if ann == "ivf" and len(ids):
+            # Lists are trained on the full-precision vectors; only codes are scanned
+            ivf = train_ivf(vectors, min(ivf_lists or default_ivf_lists(len(ids)), len(ids)))
+
+        return cls(list(ids), list(documents), list(metadatas), codes, scales, vectors,
+                   quantization=quantization, ann=ann, hnsw=hnsw, hnsw_m=hnsw_m,
+                   ef_construction=ef_construction, ef_search=ef_search,
+                   rescore_factor=rescore_factor, ivf=ivf, ivf_lists=ivf_lists,
+                   ivf_probe=ivf_probe)
+
+    def save(self, path):
+        import numpy as np
+
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, CODES_FILE), self.codes)
+        np.save(os.path.join(path, VECTORS_FILE), np.asarray(self.vectors, dtype=np.float32))
+        # Optional files are removed when unused so a stale one is never loaded
+        for name, value in ((SCALES_FILE, self.scales), (HNSW_FILE, self.hnsw),
+                            (IVF_CENTROIDS_FILE, self.ivf), (IVF_ROWS_FILE, self.ivf),
+                            (IVF_OFFSETS_FILE, self.ivf)):
+            if value is None and os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        if self.scales is not None:
+            np.save(os.path.join(path, SCALES_FILE), self.scales)
+        if self.hnsw is not None:
+            self.hnsw.save_index(os.path.join(path, HNSW_FILE))
+        if self.ivf is not None:
+            for name, value in zip((IVF_CENTROIDS_FILE, IVF_ROWS_FILE, IVF_OFFSETS_FILE), self.ivf):
+                np.save(os.path.join(path, name), value)
+        with open(os.path.join(path, RECORDS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "documents": self.documents,
+                       "metadatas": self.metadatas}, f, ensure_ascii=False)
+        # Meta last: its presence marks a complete index
+        with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"quantization": self.quantization, "ann": self.ann,
+                       "hnsw_m": self.hnsw_m, "ef_construction": self.ef_construction,
+                       "ef_search": self.ef_search, "rescore_factor": self.rescore_factor,
+                       "ivf_lists": self.ivf_lists, "ivf_probe": self.ivf_probe,
+                       "count": len(self.ids), "dim": int(self.codes.shape[1]) if len(self.ids) else 0},
+                      f)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved by `save`; array files are memory-mapped."""
+        import numpy as np
+
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(path, RECORDS_FILE), encoding="utf-8") as f:
+            records = json.load(f)
+
+        codes = np.load(os.path.join(path, CODES_FILE), mmap_mode="r")
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        scales_path = os.path.join(path, SCALES_FILE)
+        scales = np.load(scales_path, mmap_mode="r") if os.path.exists(scales_path) else None
+
+        hnsw = None
+        hnsw_path = os.path.join(path, HNSW_FILE)
+        if meta["ann"] == "hnsw" and os.path.exists(hnsw_path):
+            import hnswlib
+
+            hnsw = hnswlib.Index(space="ip", dim=meta["dim"])
+            hnsw.load_index(hnsw_path, max_elements=meta["count"])
+            hnsw.set_ef(meta["ef_search"])
+
+        ivf = None
+        ivf_paths = [os.path.join(path, name)
+                     for name in (IVF_CENTROIDS_FILE, IVF_ROWS_FILE, IVF_OFFSETS_FILE)]
+        if meta["ann"] == "ivf" and all(os.path.exists(p) for p in ivf_paths):
+            centroids, rows, offsets = (np.load(p, mmap_mode="r") for p in ivf_paths)
+            # Centroids and offsets are small and read on every query
+            ivf = (np.asarray(centroids), rows, np.asarray(offsets))
+
+        return cls(records["ids"], records["documents"], records["metadatas"],
+                   codes, scales, vectors, quantization=meta["quantization"], ann=meta["ann"],
+                   hnsw=hnsw, hnsw_m=meta["hnsw_m"], ef_construction=meta["ef_construction"],
+                   ef_search=meta["ef_search"], rescore_factor=meta["rescore_factor"],
+                   ivf=ivf, ivf_lists=meta.get("ivf_lists"), ivf_probe=meta.get("ivf_probe", 32))
+
+    def _score_codes(self, query, codes, scales):
+        import numpy as np
+
+        if scales is None:
+            return np.asarray(codes).astype(np.float32) @ query
+        # int8 x int8 products summed in int32, scaled back per row
+        query_scale = max(float(np.abs(query).max()) / 127.0, 1e-12)
+        query_codes = np.clip(np.rint(query / query_scale), -127, 127).astype(np.int8)
+        dots = np.einsum("ij,j->i", np.asarray(codes), query_codes, dtype=np.int32)
+        return dots * (np.asarray(scales) * np.float32(query_scale))
+
+    def approximate_scores(self, query, rows=None, block_size=8192):
+        """Score `rows` (default: all) against the quantized codes, block by block."""
+        import numpy as np
+
+        count = len(self.ids) if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, block_size):
+            # Contiguous slices of the memory-mapped codes when scanning everything
+            block = slice(start, start + block_size) if rows is None else rows[start:start + block_size]
+            scales = None if self.scales is None else self.scales[block]
+            scores[start:start + block_size] = self._score_codes(query, self.codes[block], scales)
+        return scores
+
+    def probe_rows(self, query, n):
+        """Rows of the `ivf_probe` lists nearest to `query` (more lists if fewer than `n` rows)."""
+        import numpy as np
+
+        centroids, rows, offsets = self.ivf
+        sizes = offsets[1:] - offsets[:-1]
+        lists = np.argsort(-(centroids @ query))
+        needed = max(min(self.ivf_probe, len(lists)), 1)
+        needed = max(needed, int(np.searchsorted(np.cumsum(sizes[lists]), n)) + 1)
+        probed = np.sort(lists[:needed])
+        return np.concatenate([rows[offsets[i]:offsets[i + 1]] for i in probed]).astype(np.int64)
+
+    def candidates(self, query, n):
+        """Return up to `n` candidate rows from the approximate stage."""
+        import numpy as np
+
+        n = min(n, len(self.ids))
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        if self.hnsw is not None:
+            self.hnsw.set_ef(max(self.ef_search, n))
+            labels, _ = self.hnsw.knn_query(query, k=n)
+            return labels[0].astype(np.int64)
+
+        rows = self.probe_rows(query, n) if self.ivf is not None else None
+        scores = self.approximate_scores(query, rows)
+        top = np.argpartition(-scores, n - 1)[:n]
+        top = top[np.argsort(-scores[top])]
+        return top if rows is None else rows[top]
+
+    def search(self, query_embedding, k=2, rescore=True):
+        """Return (rows, similarities) of the `k` nearest entries."""
+        import numpy as np
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        rows = self.candidates(query, k * self.rescore_factor if rescore else k)
+        if len(rows) == 0:
+            return rows, []
+        if not rescore:
+            return rows, self.approximate_scores(query, rows).tolist()
+
+        # Full-precision re-scoring of the candidates only
+        order = np.sort(rows)
+        scores = np.asarray(self.vectors[order]) @ query
+        best = np.argsort(-scores)[:k]
+        return order[best], scores[best].tolist()
+
+    def exact_search(self, query_embedding, k=2):
+        """Brute-force full-precision search, used as ground truth."""
+        import numpy as np
+
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        scores = np.asarray(self.vectors) @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top].tolist()
+
+    def size_report(self):
+        """Return resident sizes in bytes of each component."""
+        count = len(self.ids)
+        dim = int(self.codes.shape[1]) if count else 0
+        report = {
+            "count": count,
+            "dim": dim,
+            "float32_bytes": count * dim * 4,
+            "codes_bytes": int(self.codes.nbytes),
+            "scales_bytes": int(self.scales.nbytes) if self.scales is not None else 0,
+        }
+        if self.hnsw is not None:
+            # hnswlib keeps float32 data plus ~2*M links per element on level 0
+            report["hnsw_bytes"] = count * (dim * 4 + self.hnsw_m * 2 * 4 + 8)
+        if self.ivf is not None:
+            report["ivf_bytes"] = sum(int(part.nbytes) for part in self.ivf)
+        return report
+
+
+def collection_index_path(name):
+    return os.path.join(quantized_index_dir, name)
+
+
+def build_from_collection(chroma_collection, batch_size=5000, **kwargs):
+    """Build a QuantizedIndex from every entry of a Chroma collection.
+
+    Pages are copied straight into one preallocated float32 array; chunks
+    without an embedding of the common dimension are skipped (see
+    `vector_store.compact_collection`).
+    """
+    import numpy as np
+    from vector_store import iter_collection
+
+    capacity = chroma_collection.count()
+    ids, documents, metadatas = [], [], []
+    seen_ids = set()
+    vectors = None
+    for batch in iter_collection(chroma_collection, batch_size):
+        for chunk_id, document, metadata, embedding in zip(
+                batch["ids"], batch["documents"], batch["metadatas"], batch["embeddings"]):
+            if chunk_id in seen_ids or embedding is None:
+                continue
+            if vectors is None:
+                vectors = np.empty((capacity, len(embedding)), dtype=np.float32)
+            if len(embedding) != vectors.shape[1] or len(ids) >= capacity:
+                continue
+            seen_ids.add(chunk_id)
+            vectors[len(ids)] = embedding
+            ids.append(chunk_id)
+            documents.append(document)
+            metadatas.append(metadata)
+
+    if vectors is None:
+        vectors = np.empty((0, 0), dtype=np.float32)
+    return QuantizedIndex.build(ids, documents, metadatas, vectors[:len(ids)], **kwargs)
+
+
+def build_and_save(chroma_collection, **kwargs):
+    """Build the quantized index for a collection and save it under QUANTIZED_INDEX_DIR."""
+    import shutil
+
+    index = build_from_collection(chroma_collection, **kwargs)
+    path = collection_index_path(chroma_collection.name)
+    # Write next to the live index, then swap directories
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    old_path = f"{path}.old-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    index.save(tmp_path)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return index
+
+
+def recall_report(index, k=5, num_queries=100, seed=0, queries=None):
+    """Compare approximate search against exact search.
+
+    `queries` should be real query embeddings (e.g. the warm-up snapshot).
+    Without them, stored vectors are sampled leave-one-out: each sampled
+    row is dropped from both result lists, so a query never counts itself
+    as a hit. Reports recall@k and mean latency for exact search, the
+    quantized/ANN stage alone and the ANN stage with full-precision
+    re-scoring.
+    """
+    import numpy as np
+
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    if num_queries < 1:
+        raise ValueError("num_queries must be at least 1")
+    if len(index) == 0:
+        return {"queries": 0, "k": k, "query_source": None}
+
+    rng = np.random.default_rng(seed)
+    if queries is not None and len(queries):
+        query_source = "provided"
+        queries = np.asarray(queries, dtype=np.float32)
+        if len(queries) > num_queries:
+            queries = queries[np.sort(rng.choice(len(queries), size=num_queries, replace=False))]
+        excluded = [None] * len(queries)
+    else:
+        query_source = "leave-one-out"
+        rows = np.sort(rng.choice(len(index), size=min(num_queries, len(index)), replace=False))
+        queries = np.asarray(index.vectors[rows])
+        excluded = rows.tolist()
+
+    def top_k(results, skip):
+        return [row for row in results.tolist() if row != skip][:k]
+
+    timings = {"exact": 0.0, "ann": 0.0, "ann_rescored": 0.0}
+    hits = {"ann": 0, "ann_rescored": 0}
+    total = 0
+    for query, skip in zip(queries, excluded):
+        # One extra result covers the excluded row
+        fetch = k if skip is None else k + 1
+        start = time.perf_counter()
+        truth, _ = index.exact_search(query, fetch)
+        timings["exact"] += time.perf_counter() - start
+        truth = set(top_k(truth, skip))
+        total += len(truth)
+
+        for name, rescore in (("ann", False), ("ann_rescored", True)):
+            start = time.perf_counter()
+            found, _ = index.search(query, fetch, rescore=rescore)
+            timings[name] += time.perf_counter() - start
+            hits[name] += len(truth.intersection(top_k(found, skip)))
+
+    return {
+        "queries": len(queries),
+        "k": k,
+        "query_source": query_source,
+        "recall_ann": hits["ann"] / total if total else None,
+        "recall_ann_rescored": hits["ann_rescored"] / total if total else None,
+        "latency_ms_exact": 1000 * timings["exact"] / len(queries),
+        "latency_ms_ann": 1000 * timings["ann"] / len(queries),
+        "latency_ms_ann_rescored": 1000 * timings["ann_rescored"] / len(queries),
+        "speedup_ann_rescored": timings["exact"] / max(timings["ann_rescored"], 1e-12),
+    }
+
+
+def create_quantized_vector_store(index):
+    """Wrap a QuantizedIndex as a read-only llama_index vector store."""
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    from llama_index.core.schema import TextNode
+    from llama_index.core.vector_stores.types import BasePydanticVectorStore, VectorStoreQueryResult
+    from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+    class QuantizedVectorStore(BasePydanticVectorStore):
+        """Read-only vector store backed by a QuantizedIndex."""
+
+        stores_text: bool = True
+        _index = PrivateAttr()
+
+        def __init__(self, quantized_index):
+            super().__init__()
+            self._index = quantized_index
+
+        @property
+        def client(self):
+            return self._index
+
+        def add(self, nodes, **add_kwargs):
+            raise NotImplementedError("Quantized index is read-only; rebuild it with manage_index.py quantize")
+
+        def delete(self, ref_doc_id, **delete_kwargs):
+            raise NotImplementedError("Quantized index is read-only; rebuild it with manage_index.py quantize")
+
+        def query(self, query, **kwargs):
+            rows, similarities = self._index.search(query.query_embedding, query.similarity_top_k)
+            nodes, ids = [], []
+            for row in rows.tolist():
+                node_id = self._index.ids[row]
+                text = self._index.documents[row] or ""
+                metadata = self._index.metadatas[row] or {}
+                try:
+                    node = metadata_dict_to_node(metadata)
+                    node.set_content(text)
+                except Exception:
+                    node = TextNode(text=text, id_=node_id, metadata=metadata)
+                nodes.append(node)
+                ids.append(node_id)
+            return VectorStoreQueryResult(nodes=nodes, similarities=similarities, ids=ids)
+
+    return QuantizedVectorStore(index)
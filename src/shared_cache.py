@@ -0,0 +1,218 @@
+"""
+Shared SQLite cache
+Key/value cache in a local SQLite database (WAL mode) so that answer and
+query-embedding cache hits, in-flight questions and the LLM rate limit are
+shared by all worker processes
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from array import array
+
+logger = logging.getLogger(__name__)
+
+shared_cache_path = os.getenv(
+    "SHARED_CACHE_PATH",
+    os.path.join(os.path.dirname(__file__), '..', 'data', 'cache', 'shared_cache.sqlite3'))
+answer_cache_ttl = float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+# Oldest query embeddings beyond this many rows are dropped
+embedding_cache_size = int(os.getenv("SHARED_EMBEDDING_CACHE_SIZE", "100000"))
+# Minimum seconds between two purges by the same process
+purge_interval = float(os.getenv("SHARED_CACHE_PURGE_INTERVAL", "60"))
+# Seconds a worker may hold a question before others stop waiting for it
+answer_claim_ttl = float(os.getenv("ANSWER_CLAIM_TTL", "120"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS embeddings (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    created REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS claims (
+    key TEXT PRIMARY KEY,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_limits (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS answers_created ON answers (created);
+CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created);
+"""
+
+
+class SharedCache:
+    """Answer and embedding cache backed by one SQLite file in WAL mode.
+
+    WAL lets any number of worker processes read while one writes; each
+    thread gets its own connection. Claims let identical questions on
+    different workers wait for one answer instead of each calling the LLM.
+    Writes purge expired answers and trim the embeddings table to
+    `max_embeddings` rows (oldest first), at most once per `purge_interval`
+    seconds.
+    """
+
+    def __init__(self, path=None, ttl=None, max_embeddings=None):
+        self.path = path or shared_cache_path
+        self.ttl = answer_cache_ttl if ttl is None else ttl
+        self.max_embeddings = embedding_cache_size if max_embeddings is None else max_embeddings
+        self._local = threading.local()
+        self._last_purge = None
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(embeddings)")]
+            if "created" not in columns:
+                # Databases created before the embeddings table was capped
+                try:
+                    conn.execute(
+                        "ALTER TABLE embeddings ADD COLUMN created REAL NOT NULL DEFAULT 0")
+                except sqlite3.OperationalError:
+                    pass  # another worker migrated it first
+            conn.executescript(_INDEXES)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_answer(self, key):
+        row = self._connect().execute(
+            "SELECT value, created FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self.ttl and time.time() - created > self.ttl:
+            return None
+        return value
+
+    def set_answer(self, key, value):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, value, created) VALUES (?, ?, ?)",
+                (key, value, time.time()))
+        self._maybe_purge()
+
+    def get_embedding(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return array("f", row[0]).tolist()
+
+    def set_embedding(self, key, embedding):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, value, created) VALUES (?, ?, ?)",
+                (key, array("f", embedding).tobytes(), time.time()))
+        self._maybe_purge()
+
+    def clear_answers(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM answers")
+
+    def claim(self, key, ttl=None):
+        """Mark `key` as being answered by the caller.
+
+        Returns False while another worker holds an unexpired claim on it.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM claims WHERE key = ? AND expires < ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO claims (key, expires) VALUES (?, ?)",
+                (key, now + (answer_claim_ttl if ttl is None else ttl)))
+            return cursor.rowcount == 1
+
+    def release(self, key):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM claims WHERE key = ?", (key,))
+
+    def wait_for_answer(self, key, timeout=None, poll_interval=0.05):
+        """Wait while another worker holds the claim on `key`; returns its answer or None."""
+        deadline = time.monotonic() + (answer_claim_ttl if timeout is None else timeout)
+        conn = self._connect()
+        while time.monotonic() < deadline:
+            answer = self.get_answer(key)
+            if answer is not None:
+                return answer
+            claimed = conn.execute(
+                "SELECT 1 FROM claims WHERE key = ? AND expires >= ?", (key, time.time())).fetchone()
+            if claimed is None:
+                # Released without an answer (failed) or expired
+                return self.get_answer(key)
+            time.sleep(poll_interval)
+        return None
+
+    def take_token(self, name, rate, burst):
+        """Token bucket shared by all processes.
+
+        Returns 0 when a token was taken, otherwise the seconds to wait.
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            # Read-modify-write under the database write lock
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_limits WHERE name = ?", (name,)).fetchone()
+            tokens, updated = row if row is not None else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limits (name, tokens, updated) VALUES (?, ?, ?)",
+                (name, tokens, now))
+        return wait
+
+    def purge(self):
+        """Delete expired answers and claims, and the oldest embeddings beyond the cap."""
+        self._last_purge = time.monotonic()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM claims WHERE expires < ?", (time.time(),))
+            if self.ttl:
+                conn.execute("DELETE FROM answers WHERE created < ?", (time.time() - self.ttl,))
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings "
+                "ORDER BY created DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_embeddings,))
+
+    def _maybe_purge(self):
+        if self._last_purge is None or time.monotonic() - self._last_purge >= purge_interval:
+            try:
+                self.purge()
+            except sqlite3.Error as e:
+                logger.warning(f"Shared cache purge failed: {e}")
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    """Return the process-wide SharedCache, opening it on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                _shared_cache = SharedCache()
+    return _shared_cache
@@ -0,0 +1,234 @@
+"""
+Persistent ChromaDB store shared by all backend processes
+One writer (ingestion) persists collections to disk and bumps an index
+version stamp; read-only query workers reopen the store when it changes
+"""
+
+import os
+import time
+import atexit
+import sqlite3
+import logging
+import threading
+from embedding_cache import embedding_model_name
+from shared_cache import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+chroma_persist_dir = os.getenv(
+    "CHROMA_PERSIST_DIR", os.path.join(os.path.dirname(__file__), '..', 'data', 'chroma_db'))
+
+# "standalone": one process serves queries and ingests uploads itself
+# "writer": the ingestion process of multi-worker mode
+# "reader": query worker; uploads are queued for the ingestion writer and
+#           the store is opened without ever writing back to disk
+backend_role = os.getenv("BACKEND_ROLE", "standalone")
+
+INDEX_VERSION_FILE = "index_version"
+
+_client = None
+_client_version = None
+_embedding_function = None
+_read_only_classes = {}
+_lock = threading.Lock()
+
+
+def get_index_version():
+    """Return the version stamp written by the last ingestion (0 if none)."""
+    try:
+        with open(os.path.join(chroma_persist_dir, INDEX_VERSION_FILE)) as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_index_version():
+    version = time.time_ns()
+    path = os.path.join(chroma_persist_dir, INDEX_VERSION_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, path)
+    return version
+
+
+def _open_chroma_client():
+    import chromadb
+
+    os.makedirs(chroma_persist_dir, exist_ok=True)
+    if hasattr(chromadb, "PersistentClient"):
+        # chromadb >= 0.4 caches one system per path; drop it to see new data
+        try:
+            from chromadb.api.client import SharedSystemClient
+            SharedSystemClient.clear_system_cache()
+        except ImportError:
+            pass
+        return chromadb.PersistentClient(path=chroma_persist_dir)
+
+    from chromadb.config import Settings as ChromaSettings
+    client = chromadb.Client(ChromaSettings(
+        chroma_db_impl="duckdb+parquet",
+        persist_directory=chroma_persist_dir,
+    ))
+    if backend_role == "reader":
+        _disable_write_back(client)
+    return client
+
+
+def _disable_write_back(client):
+    """Stop a duckdb+parquet client from writing its in-memory copy to disk.
+
+    chromadb 0.3 persists when the database object is garbage-collected (on
+    reopen and at interpreter exit; some releases also register an atexit
+    hook); for a reader that copy is stale and would overwrite whatever the
+    writer ingested since.
+    """
+    db = getattr(client, "_db", None)
+    if db is None or not hasattr(db, "persist"):
+        return
+    atexit.unregister(db.persist)
+    db_class = type(db)
+    if db_class not in _read_only_classes:
+        _read_only_classes[db_class] = type(f"ReadOnly{db_class.__name__}", (db_class,), {
+            "persist": lambda self: None,
+            "__del__": lambda self: None,
+        })
+    db.__class__ = _read_only_classes[db_class]
+
+
+def get_chroma_client():
+    """Return the process-wide Chroma client, reopening it after another process ingested."""
+    global _client, _client_version
+    version = get_index_version()
+    with _lock:
+        if _client is None or version != _client_version:
+            if _client is not None:
+                logger.info("Vector store changed on disk, reopening")
+            _client = _open_chroma_client()
+            _client_version = version
+        return _client
+
+
+def persist_chroma_client(client):
+    """Flush `client` to disk and publish a new index version to the other processes."""
+    global _client_version
+    if backend_role == "reader":
+        raise RuntimeError("Read-only query workers must not persist the vector store")
+    if hasattr(client, "persist"):
+        client.persist()
+    with _lock:
+        version = _write_index_version()
+        if client is _client:
+            _client_version = version
+    _clear_cached_answers()
+    return version
+
+
+def _clear_cached_answers():
+    # Answers are keyed by index version, so the old ones can never hit again
+    try:
+        get_shared_cache().clear_answers()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not clear cached answers: {e}")
+
+
+def _precomputed_embeddings_only(texts):
+    raise RuntimeError("Read-only query workers only query with precomputed embeddings")
+
+
+def get_chroma_embedding_function():
+    """Return the process-wide embedding function attached to Chroma collections."""
+    global _embedding_function
+    if backend_role == "reader":
+        # Queries arrive as embeddings from get_embed_model(); building the
+        # SentenceTransformer here would load a second copy of the weights
+        return _precomputed_embeddings_only
+    with _lock:
+        if _embedding_function is None:
+            from chromadb.utils import embedding_functions
+
+            _embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                model_name=embedding_model_name
+            )
+        return _embedding_function
+
+
+def open_collection(name):
+    """Open an existing collection of the persistent store (raises if missing)."""
+    return get_chroma_client().get_collection(
+        name=name, embedding_function=get_chroma_embedding_function())
+
+
+def iter_collection(chroma_collection, batch_size=5000):
+    """Yield the collection in pages of ids, documents, metadatas and embeddings."""
+    total = chroma_collection.count()
+    for offset in range(0, total, batch_size):
+        batch = chroma_collection.get(
+            include=["documents", "metadatas", "embeddings"],
+            limit=batch_size,
+            offset=offset,
+        )
+        embeddings = batch.get("embeddings")
+        yield {
+            "ids": list(batch["ids"]),
+            "documents": list(batch.get("documents") or [None] * len(batch["ids"])),
+            "metadatas": list(batch.get("metadatas") or [None] * len(batch["ids"])),
+            "embeddings": list(embeddings) if embeddings is not None else [None] * len(batch["ids"]),
+        }
+
+
+def compact_collection(chroma_collection, dry_run=False, batch_size=5000):
+    """Remove duplicate and orphaned chunks from a collection.
+
+    A chunk is a duplicate when its text matches an earlier chunk (re-uploads
+    of the same PDF), and orphaned when it has no text, no embedding or an
+    embedding whose dimension differs from the rest of the collection.
+    Pages are streamed and only (id, text digest, dimension) is kept per
+    chunk. Returns a summary dict; nothing is deleted when `dry_run` is True.
+    """
+    import hashlib
+    from collections import Counter
+
+    seen_ids = set()
+    records = []
+    dims = Counter()
+    for batch in iter_collection(chroma_collection, batch_size):
+        for chunk_id, document, embedding in zip(batch["ids"], batch["documents"], batch["embeddings"]):
+            # offset pages have no stable order, so the same id can come back
+            if chunk_id in seen_ids:
+                continue
+            seen_ids.add(chunk_id)
+            text = (document or "").strip()
+            digest = hashlib.sha1(text.encode("utf-8")).digest() if text else None
+            dim = len(embedding) if embedding is not None else None
+            if dim is not None:
+                dims[dim] += 1
+            records.append((chunk_id, digest, dim))
+
+    expected_dim = dims.most_common(1)[0][0] if dims else None
+
+    kept_digests = set()
+    kept_ids = set()
+    duplicate_ids, orphan_ids = [], []
+    for chunk_id, digest, dim in records:
+        if digest is None or dim != expected_dim:
+            orphan_ids.append(chunk_id)
+        elif digest in kept_digests:
+            duplicate_ids.append(chunk_id)
+        else:
+            kept_digests.add(digest)
+            kept_ids.add(chunk_id)
+
+    to_delete = [chunk_id for chunk_id in duplicate_ids + orphan_ids if chunk_id not in kept_ids]
+    if to_delete and not dry_run:
+        for start in range(0, len(to_delete), 5000):
+            chroma_collection.delete(ids=to_delete[start:start + 5000])
+
+    return {
+        "collection": chroma_collection.name,
+        "before": len(records),
+        "duplicates": len(duplicate_ids),
+        "orphans": len(orphan_ids),
+        "after": len(records) - (0 if dry_run else len(to_delete)),
+        "dry_run": dry_run,
+    }
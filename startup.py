@@ -5,6 +5,7 @@ Startup script to verify configuration and dependencies
 
 import os
 import sys
+import importlib.util
 from dotenv import load_dotenv
 
 # Load .env from config directory
@@ -40,10 +41,11 @@ def check_environment():
     
     all_ok = True
     for package_name, import_name in dependencies:
-        try:
-            __import__(import_name)
+        # find_spec locates the package without importing it (importing
+        # torch/transformers alone takes several seconds)
+        if importlib.util.find_spec(import_name) is not None:
             print(f"✅ {package_name}")
-        except ImportError:
+        else:
             print(f"❌ {package_name} - NOT INSTALLED")
             all_ok = False
     
@@ -0,0 +1,45 @@
+import os
+import sys
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# The backend modules import each other as top-level modules (see run_backend.py)
+sys.path.insert(0, SRC_DIR)
+
+
+class FakeCollection:
+    """Minimal Chroma collection whose pages can repeat ids like unordered offsets."""
+
+    name = "fake"
+
+    def __init__(self, rows, pages=None):
+        self.rows = rows
+        self.pages = pages
+        self.deleted = []
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, include, limit, offset):
+        if self.pages is not None:
+            page = self.pages[offset // limit]
+        else:
+            page = self.rows[offset:offset + limit]
+        return {
+            "ids": [row[0] for row in page],
+            "documents": [row[1] for row in page],
+            "metadatas": [{} for _ in page],
+            "embeddings": [row[2] for row in page],
+        }
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+        self.rows = [row for row in self.rows if row[0] not in ids]
+
+
+@pytest.fixture
+def fake_collection():
+    """The FakeCollection class, for tests that page through a collection."""
+    return FakeCollection
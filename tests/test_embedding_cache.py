@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from embedding_cache import QueryEmbeddingCache, SNAPSHOT_KEYS_FILE
+
+
+def test_runtime_entries_are_bounded_lru():
+    cache = QueryEmbeddingCache(max_entries=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    assert cache.get("a") == [1.0]  # "a" becomes most recently used
+
+    cache.put("c", [3.0])
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == [1.0]
+    assert cache.get("c") == [3.0]
+
+
+def snapshot(tmp_path, entries):
+    cache = QueryEmbeddingCache()
+    for text, embedding in entries.items():
+        cache.put(text, embedding)
+    cache.save_snapshot(str(tmp_path))
+    return cache
+
+
+def test_snapshot_round_trip_is_memory_mapped(tmp_path):
+    np = pytest.importorskip("numpy")
+    snapshot(tmp_path, {"a": [1.0, 2.0], "b": [3.0, 4.0]})
+
+    cache = QueryEmbeddingCache()
+    assert cache.load_snapshot(str(tmp_path))
+
+    assert isinstance(cache._snapshot_vectors, np.memmap)
+    assert cache.get("a") == [1.0, 2.0]
+    assert cache.get("b") == [3.0, 4.0]
+    assert not cache.dirty
+
+
+def test_snapshot_of_another_model_is_ignored(tmp_path):
+    pytest.importorskip("numpy")
+    snapshot(tmp_path, {"a": [1.0, 2.0]})
+
+    cache = QueryEmbeddingCache()
+
+    assert cache.load_snapshot(str(tmp_path), model_name="another-model") is False
+    assert cache.get("a") is None
+
+
+def test_snapshot_with_mismatched_keys_is_ignored(tmp_path):
+    pytest.importorskip("numpy")
+    snapshot(tmp_path, {"a": [1.0, 2.0], "b": [3.0, 4.0]})
+    keys_path = tmp_path / SNAPSHOT_KEYS_FILE
+    meta = json.loads(keys_path.read_text(encoding="utf-8"))
+    meta["keys"].append("c")
+    keys_path.write_text(json.dumps(meta), encoding="utf-8")
+
+    cache = QueryEmbeddingCache()
+
+    assert cache.load_snapshot(str(tmp_path)) is False
+    assert len(cache) == 0
@@ -0,0 +1,30 @@
+import time
+import threading
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("multipart")
+
+
+def test_ready_only_after_warm_up(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import endpoint
+    from embedding_cache import QueryEmbeddingCache
+    from shared_cache import SharedCache
+
+    warmed_up = threading.Event()
+    monkeypatch.setattr(endpoint, "warm_up", lambda: warmed_up.wait(5))
+    monkeypatch.setattr(endpoint, "configure_google_api_key", lambda: None)
+    monkeypatch.setattr(endpoint, "query_embedding_cache", QueryEmbeddingCache())
+    monkeypatch.setattr(endpoint, "get_shared_cache", lambda: SharedCache(str(tmp_path / "cache.sqlite3")))
+
+    with TestClient(endpoint.app) as client:
+        assert client.get("/ready").status_code == 503
+
+        warmed_up.set()
+        deadline = time.monotonic() + 5
+        while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert client.get("/ready").status_code == 200
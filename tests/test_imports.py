@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("multipart")
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+HEAVY_MODULES = ["torch", "transformers", "chromadb", "llama_index"]
+
+
+def test_importing_the_app_defers_heavy_dependencies():
+    # A fresh interpreter: other tests may already have imported these
+    code = (
+        "import sys\n"
+        "import endpoint\n"
+        f"print('loaded:', *[name for name in {HEAVY_MODULES!r} if name in sys.modules])\n"
+    )
+    env = dict(os.environ, PYTHONPATH=SRC_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    result = subprocess.run([sys.executable, "-c", code], cwd=SRC_DIR, env=env,
+                            capture_output=True, text=True, timeout=120)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1].split() == ["loaded:"]
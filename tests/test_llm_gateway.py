@@ -0,0 +1,203 @@
+import time
+import threading
+
+import pytest
+
+import llm_gateway
+from llm_gateway import (
+    LLMGateway, LLMTimeoutError, LLMUnavailableError, _RateLimiter, _SharedRateLimiter, wrap_llm,
+)
+
+
+class Unavailable(Exception):
+    code = 503
+
+
+def gateway(**kwargs):
+    options = dict(max_concurrency=4, rate_limit=0, max_retries=3,
+                   backoff_base=0.001, backoff_max=0.01, timeout=5)
+    options.update(kwargs)
+    return LLMGateway(**options)
+
+
+def test_concurrent_identical_calls_share_one_upstream_call():
+    llm = gateway()
+    calls = []
+    release = threading.Event()
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(llm.call("question", upstream)))
+               for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["answer"] * 5
+
+
+def test_retryable_errors_are_retried():
+    llm = gateway()
+    attempts = []
+
+    def upstream():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise Unavailable("busy")
+        return "answer"
+
+    assert llm.call("question", upstream) == "answer"
+    assert len(attempts) == 3
+
+
+def test_gives_up_after_max_retries():
+    llm = gateway(max_retries=2)
+    attempts = []
+
+    def upstream():
+        attempts.append(1)
+        raise Unavailable("busy")
+
+    with pytest.raises(LLMUnavailableError):
+        llm.call("question", upstream)
+    assert len(attempts) == 3
+
+
+def test_other_errors_are_not_retried():
+    llm = gateway()
+    attempts = []
+
+    def upstream():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        llm.call("question", upstream)
+    assert len(attempts) == 1
+
+
+def test_timeout_is_not_retried_and_bounds_the_call():
+    llm = gateway(timeout=0.2)
+    attempts = []
+    release = threading.Event()
+
+    def upstream():
+        attempts.append(1)
+        release.wait(5)
+
+    start = time.monotonic()
+    try:
+        with pytest.raises(LLMTimeoutError):
+            llm.call("question", upstream)
+    finally:
+        release.set()
+
+    assert time.monotonic() - start < 1
+    assert len(attempts) == 1
+
+
+def test_timeout_covers_waiting_for_a_free_slot():
+    llm = gateway(max_concurrency=1, timeout=0.2)
+    release = threading.Event()
+    busy = threading.Thread(target=lambda: llm.call("first", lambda: release.wait(5), timeout=5))
+    busy.start()
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    try:
+        with pytest.raises(LLMTimeoutError):
+            llm.call("second", lambda: "answer")
+    finally:
+        release.set()
+        busy.join(5)
+
+    assert time.monotonic() - start < 1
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = _RateLimiter(rate=20, burst=1)
+
+    start = time.monotonic()
+    for _ in range(3):
+        assert limiter.acquire()
+
+    # The first token is free, the next two wait 1/20 s each
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_gives_up_at_the_deadline():
+    limiter = _RateLimiter(rate=1, burst=1)
+    assert limiter.acquire()
+
+    start = time.monotonic()
+    assert limiter.acquire(deadline=time.monotonic() + 0.05) is False
+    assert time.monotonic() - start < 0.5
+
+
+def test_chat_retry_resends_the_same_messages():
+    pytest.importorskip("llama_index.core")
+    from llama_index.core.chat_engine import SimpleChatEngine
+    from llama_index.core.llms import ChatMessage, ChatResponse, MessageRole, MockLLM
+
+    sent = []
+
+    class FlakyLLM(MockLLM):
+        def chat(self, messages, **kwargs):
+            sent.append([(message.role, message.content) for message in messages])
+            if len(sent) == 1:
+                raise Unavailable("busy")
+            return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content="answer"))
+
+    engine = SimpleChatEngine.from_defaults(llm=wrap_llm(FlakyLLM(), gateway()))
+
+    assert str(engine.chat("question")) == "answer"
+    assert len(sent) == 2
+    # The engine's memory saw the question once, so the retry is identical
+    assert sent[0] == sent[1]
+    assert [content for role, content in sent[1] if role == MessageRole.USER] == ["question"]
+
+
+def test_limits_are_split_between_workers(tmp_path, monkeypatch):
+    import shared_cache
+
+    monkeypatch.setattr(shared_cache, "_shared_cache", shared_cache.SharedCache(str(tmp_path / "cache.sqlite3")))
+    monkeypatch.setattr(llm_gateway, "backend_workers", 4)
+    monkeypatch.setattr(llm_gateway, "_gateway", None)
+    monkeypatch.setenv("LLM_MAX_CONCURRENCY", "8")
+
+    gateway_for_worker = llm_gateway.get_llm_gateway()
+
+    assert isinstance(gateway_for_worker._rate_limiter, _SharedRateLimiter)
+    assert gateway_for_worker._semaphore._value == 2
+
+
+def test_shared_rate_limit_holds_across_workers(tmp_path):
+    from shared_cache import SharedCache
+
+    path = str(tmp_path / "cache.sqlite3")
+    workers = [gateway(rate_limiter=_SharedRateLimiter(SharedCache(path), rate=20, burst=1))
+               for _ in range(2)]
+
+    start = time.monotonic()
+    for i in range(3):
+        workers[i % 2].call(f"question {i}", lambda: "answer")
+
+    # One burst token, then 1/20 s per call, whichever worker makes it
+    assert time.monotonic() - start >= 0.09
+
+
+def test_llm_backends_are_pluggable(monkeypatch):
+    sentinel = object()
+    monkeypatch.setitem(llm_gateway._llm_backends, "stand-in", lambda: sentinel)
+
+    assert llm_gateway.create_llm("stand-in") is sentinel
+    with pytest.raises(ValueError):
+        llm_gateway.create_llm("unknown")
@@ -0,0 +1,91 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("llama_index.core")
+
+
+@pytest.fixture
+def quantized_backend(tmp_path, monkeypatch):
+    """Serve model.collection_name from a small saved quantized index."""
+    from llama_index.core import MockEmbedding
+    import model
+    import quantized_index
+    import vector_store
+    from quantized_index import QuantizedIndex
+
+    vectors = np.random.default_rng(0).normal(size=(20, 8)).astype(np.float32)
+    ids = [str(i) for i in range(len(vectors))]
+    QuantizedIndex.build(ids, ids, [{}] * len(ids), vectors).save(str(tmp_path / model.collection_name))
+
+    def no_chroma():
+        raise AssertionError("Chroma store opened")
+
+    monkeypatch.setattr(quantized_index, "quantized_index_dir", str(tmp_path))
+    monkeypatch.setattr(vector_store, "chroma_persist_dir", str(tmp_path / "chroma"))
+    monkeypatch.setattr(model, "vector_index_backend", "quantized")
+    monkeypatch.setattr(model, "setup_chroma_collection", no_chroma)
+    monkeypatch.setattr(model, "get_embed_model", lambda: MockEmbedding(embed_dim=8))
+    monkeypatch.setattr(model, "_query_index", None)
+    return model
+
+
+def test_quantized_backend_does_not_open_chroma(quantized_backend):
+    nodes = quantized_backend.get_query_index().as_retriever(similarity_top_k=2).retrieve("question")
+
+    assert len(nodes) == 2
+
+
+def test_chat_engine_takes_an_llm(quantized_backend):
+    from llama_index.core.llms import MockLLM
+
+    # MockLLM without max_tokens echoes the prompt it was sent
+    chat_engine, chat_history = quantized_backend.setup_chat_engine(
+        quantized_backend.get_query_index(), llm=MockLLM())
+    response = quantized_backend.chat_with_memory(chat_engine, chat_history, "What is article 1?")
+
+    assert "What is article 1?" in str(response)
+    assert len(chat_history) == 2
+
+
+def test_chat_mode_defaults_to_the_simple_engine(quantized_backend):
+    from llama_index.core.chat_engine import SimpleChatEngine
+    from llama_index.core.llms import MockLLM
+
+    chat_engine, _ = quantized_backend.setup_chat_engine(quantized_backend.get_query_index(), llm=MockLLM())
+
+    assert isinstance(chat_engine, SimpleChatEngine)
+
+
+def test_context_chat_mode_retrieves_chunks(quantized_backend, monkeypatch):
+    from llama_index.core.chat_engine import ContextChatEngine
+    from llama_index.core.llms import MockLLM
+
+    monkeypatch.setattr(quantized_backend, "chat_mode", "context")
+    chat_engine, chat_history = quantized_backend.setup_chat_engine(
+        quantized_backend.get_query_index(), llm=MockLLM())
+    response = quantized_backend.chat_with_memory(chat_engine, chat_history, "What is article 1?")
+
+    assert isinstance(chat_engine, ContextChatEngine)
+    assert len(response.source_nodes) > 0
+
+
+def test_unknown_chat_mode_is_rejected(quantized_backend, monkeypatch):
+    from llama_index.core.llms import MockLLM
+
+    monkeypatch.setattr(quantized_backend, "chat_mode", "agent")
+
+    with pytest.raises(ValueError):
+        quantized_backend.setup_chat_engine(quantized_backend.get_query_index(), llm=MockLLM())
+
+
+def test_mock_backend_needs_no_api_key(quantized_backend, monkeypatch):
+    import llm_gateway
+
+    monkeypatch.setattr(llm_gateway, "llm_backend", "mock")
+    monkeypatch.setattr(quantized_backend, "llm_backend", "mock")
+    monkeypatch.setattr(llm_gateway, "_llm", None)
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+
+    chat_engine, chat_history = quantized_backend.setup_chat_engine(quantized_backend.get_query_index())
+
+    assert str(quantized_backend.chat_with_memory(chat_engine, chat_history, "question"))
@@ -0,0 +1,106 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from quantized_index import QuantizedIndex, recall_report
+
+
+def build(count=500, dim=32, **kwargs):
+    vectors = np.random.default_rng(0).normal(size=(count, dim)).astype(np.float32)
+    ids = [str(i) for i in range(count)]
+    return QuantizedIndex.build(ids, ids, [{}] * count, vectors, ann="flat", **kwargs)
+
+
+def test_leave_one_out_does_not_count_the_query_itself():
+    index = build()
+    # A search that only ever returns the query's own row
+    index.search = lambda query, k, rescore=True: (index.exact_search(query, 1)[0], [])
+
+    report = recall_report(index, k=5, num_queries=20)
+
+    assert report["query_source"] == "leave-one-out"
+    assert report["recall_ann"] == 0
+    assert report["recall_ann_rescored"] == 0
+
+
+def test_provided_queries_are_used():
+    index = build()
+    queries = np.random.default_rng(1).normal(size=(10, 32)).astype(np.float32)
+
+    report = recall_report(index, k=5, num_queries=100, queries=queries)
+
+    assert report["query_source"] == "provided"
+    assert report["queries"] == 10
+    assert report["recall_ann_rescored"] == pytest.approx(1.0)
+
+
+@pytest.mark.parametrize("k, num_queries", [(0, 10), (5, 0)])
+def test_rejects_empty_reports(k, num_queries):
+    with pytest.raises(ValueError):
+        recall_report(build(count=10), k=k, num_queries=num_queries)
+
+
+def test_build_from_collection_skips_repeated_ids_and_bad_rows(fake_collection):
+    from quantized_index import build_from_collection
+
+    rows = [("1", "a", [1.0, 0.0]), ("2", "b", [0.0, 1.0]), ("3", "c", [1.0]), ("4", "d", None)]
+    # Offset paging returns "2" twice and never "1" again
+    collection = fake_collection(rows, pages=[rows[:3], [rows[1], rows[3]]])
+
+    index = build_from_collection(collection, batch_size=3)
+
+    assert index.ids == ["1", "2"]
+    assert index.codes.shape == (2, 2)
+
+
+def clustered(count=2000, dim=32, seed=0):
+    # Same 40 cluster centers for every seed, so queries look like the data
+    centers = np.random.default_rng(0).normal(size=(40, dim))
+    rng = np.random.default_rng(seed)
+    return (centers[rng.integers(0, 40, count)] + 0.3 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def test_ivf_scans_a_fraction_of_the_codes():
+    vectors = clustered()
+    ids = [str(i) for i in range(len(vectors))]
+    index = QuantizedIndex.build(ids, ids, [{}] * len(ids), vectors.copy(), ivf_probe=4)
+    query = vectors[0] / np.linalg.norm(vectors[0])
+
+    assert index.ann == "ivf"
+    assert len(index.probe_rows(query, 20)) < len(ids) / 4
+    report = recall_report(index, k=5, num_queries=50, queries=clustered(50, seed=1))
+    assert report["recall_ann_rescored"] >= 0.9
+
+
+def test_ivf_probing_every_list_matches_flat():
+    vectors = clustered(500)
+    ids = [str(i) for i in range(len(vectors))]
+    flat = QuantizedIndex.build(ids, ids, [{}] * len(ids), vectors.copy(), ann="flat")
+    ivf = QuantizedIndex.build(ids, ids, [{}] * len(ids), vectors.copy(), ivf_lists=8, ivf_probe=8)
+
+    for query in clustered(10, seed=2):
+        assert ivf.search(query, 5)[0].tolist() == flat.search(query, 5)[0].tolist()
+
+
+def test_int8_scores_match_dequantized_codes():
+    from quantized_index import dequantize
+
+    index = build(count=200, quantization="int8")
+    query = index.vectors[3]
+
+    expected = dequantize(np.asarray(index.codes), np.asarray(index.scales)) @ query
+    assert np.allclose(index.approximate_scores(query), expected, atol=0.01)
+
+
+def test_saved_ivf_index_is_memory_mapped(tmp_path):
+    vectors = clustered(300)
+    ids = [str(i) for i in range(len(vectors))]
+    index = QuantizedIndex.build(ids, ids, [{}] * len(ids), vectors.copy(), ivf_probe=3)
+    index.save(str(tmp_path))
+
+    loaded = QuantizedIndex.load(str(tmp_path))
+
+    assert isinstance(loaded.ivf[1], np.memmap)
+    assert loaded.ivf_probe == 3
+    query = vectors[7]
+    assert loaded.search(query, 5)[0].tolist() == index.search(query, 5)[0].tolist()
@@ -0,0 +1,98 @@
+import time
+
+import shared_cache
+from shared_cache import SharedCache
+
+
+def test_purge_drops_expired_answers(tmp_path):
+    cache = SharedCache(path=str(tmp_path / "cache.sqlite3"), ttl=60)
+    cache.set_answer("old", "stale")
+    cache.set_answer("new", "fresh")
+    with cache._connect() as conn:
+        conn.execute("UPDATE answers SET created = ? WHERE key = 'old'", (time.time() - 120,))
+
+    cache.purge()
+
+    rows = cache._connect().execute("SELECT key FROM answers").fetchall()
+    assert rows == [("new",)]
+
+
+def test_embeddings_are_capped_oldest_first(tmp_path, monkeypatch):
+    monkeypatch.setattr(shared_cache, "purge_interval", 0)
+    cache = SharedCache(path=str(tmp_path / "cache.sqlite3"), max_embeddings=2)
+    for key in ["a", "b", "c"]:
+        cache.set_embedding(key, [1.0, 2.0])
+
+    assert cache.get_embedding("a") is None
+    assert cache.get_embedding("b") == [1.0, 2.0]
+    assert cache.get_embedding("c") == [1.0, 2.0]
+
+
+def test_new_index_version_clears_answers(tmp_path, monkeypatch):
+    import vector_store
+
+    cache = SharedCache(path=str(tmp_path / "cache.sqlite3"))
+    cache.set_answer("1:constitution:question", "answer")
+    monkeypatch.setattr(vector_store, "get_shared_cache", lambda: cache)
+    monkeypatch.setattr(vector_store, "chroma_persist_dir", str(tmp_path))
+    monkeypatch.setattr(vector_store, "backend_role", "writer")
+
+    vector_store.persist_chroma_client(object())
+
+    assert cache.get_answer("1:constitution:question") is None
+
+
+def test_old_databases_are_migrated(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "cache.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+
+    cache = SharedCache(path=path)
+    cache.set_embedding("a", [1.0])
+
+    assert cache.get_embedding("a") == [1.0]
+
+
+def test_workers_wait_for_a_claimed_answer(tmp_path):
+    import threading
+
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = SharedCache(path=path), SharedCache(path=path)
+    assert first.claim("question")
+    assert not second.claim("question")
+
+    def answer():
+        time.sleep(0.1)
+        first.set_answer("question", "answer")
+        first.release("question")
+
+    threading.Thread(target=answer).start()
+    assert second.wait_for_answer("question", timeout=5) == "answer"
+
+
+def test_released_claim_without_answer_stops_waiting(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = SharedCache(path=path), SharedCache(path=path)
+    first.claim("question")
+    first.release("question")
+
+    start = time.monotonic()
+    assert second.wait_for_answer("question", timeout=5) is None
+    assert time.monotonic() - start < 1
+    assert second.claim("question")
+
+
+def test_expired_claims_can_be_taken_over(tmp_path):
+    cache = SharedCache(path=str(tmp_path / "cache.sqlite3"))
+    assert cache.claim("question", ttl=-1)
+    assert cache.claim("question")
+
+
+def test_rate_limit_tokens_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    first, second = SharedCache(path=path), SharedCache(path=path)
+
+    assert first.take_token("llm", rate=1, burst=1) == 0
+    assert second.take_token("llm", rate=1, burst=1) > 0.5
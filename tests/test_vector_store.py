@@ -0,0 +1,131 @@
+import os
+import sys
+import subprocess
+import time
+import textwrap
+
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src')
+
+# Runs in a separate process so role, client and atexit hooks are real.
+# Embeddings are passed explicitly so no embedding model is loaded.
+SCRIPT = textwrap.dedent("""
+    import os
+    import sys
+    import time
+    import vector_store
+
+    def collection():
+        return vector_store.get_chroma_client().get_or_create_collection(
+            name="test", embedding_function=lambda texts: [[0.0, 0.0, 1.0] for _ in texts])
+
+    action = sys.argv[1]
+    if action == "ingest":
+        chunk_id = sys.argv[2]
+        collection().add(ids=[chunk_id], documents=[chunk_id], embeddings=[[1.0, 0.0, 0.0]])
+        vector_store.persist_chroma_client(vector_store.get_chroma_client())
+    elif action == "count":
+        print(collection().count())
+    elif action == "reader":
+        # Each step: report the count, signal <step>.ready, wait for <step>.go
+        for step in sys.argv[2:]:
+            # Reopens (dropping the stale client) when the writer ingested
+            print(collection().count(), flush=True)
+            open(step + ".ready", "w").close()
+            while not os.path.exists(step + ".go"):
+                time.sleep(0.05)
+""")
+
+
+def run(tmp_path, role, *args, background=False):
+    env = dict(os.environ, BACKEND_ROLE=role, CHROMA_PERSIST_DIR=str(tmp_path / "chroma"),
+               SHARED_CACHE_PATH=str(tmp_path / "cache.sqlite3"), PYTHONPATH=SRC_DIR)
+    command = [sys.executable, "-c", SCRIPT, *args]
+    if background:
+        return subprocess.Popen(command, env=env, stdout=subprocess.PIPE, text=True)
+    return subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+
+
+def wait_for(path, process):
+    while not path.exists():
+        assert process.poll() is None, "reader exited early"
+        time.sleep(0.05)
+
+
+def test_reader_does_not_overwrite_writer_data(tmp_path):
+    pytest.importorskip("chromadb")
+    run(tmp_path, "writer", "ingest", "first")
+
+    steps = [tmp_path / "reload", tmp_path / "shutdown"]
+    reader = run(tmp_path, "reader", "reader", *map(str, steps), background=True)
+    try:
+        for step, chunk_id in zip(steps, ["second", "third"]):
+            wait_for(step.with_suffix(".ready"), reader)
+            run(tmp_path, "writer", "ingest", chunk_id)
+            step.with_suffix(".go").touch()
+        output, _ = reader.communicate(timeout=60)
+    finally:
+        if reader.poll() is None:
+            reader.kill()
+
+    assert reader.returncode == 0
+    # The reader picked up "second" on reload but still holds a copy without
+    # "third" when it shuts down; that copy must not reach the disk
+    assert output.split() == ["1", "2"]
+    assert run(tmp_path, "writer", "count").strip() == "3"
+
+
+def test_reader_refuses_to_persist(tmp_path, monkeypatch):
+    import vector_store
+
+    monkeypatch.setattr(vector_store, "backend_role", "reader")
+    with pytest.raises(RuntimeError):
+        vector_store.persist_chroma_client(object())
+
+
+def test_reader_does_not_load_an_embedding_model(monkeypatch):
+    import vector_store
+
+    monkeypatch.setattr(vector_store, "backend_role", "reader")
+    monkeypatch.setattr(vector_store, "_embedding_function", None)
+
+    embedding_function = vector_store.get_chroma_embedding_function()
+
+    assert vector_store._embedding_function is None
+    with pytest.raises(RuntimeError):
+        embedding_function(["question"])
+
+
+def test_compact_removes_duplicates_and_orphans(fake_collection):
+    from vector_store import compact_collection
+
+    collection = fake_collection([
+        ("1", "a", [1.0, 0.0]),
+        ("2", "a", [1.0, 0.0]),
+        ("3", "", [1.0, 0.0]),
+        ("4", "b", None),
+        ("5", "c", [1.0]),
+        ("6", "d", [0.0, 1.0]),
+    ])
+
+    dry_run = compact_collection(collection, dry_run=True)
+    assert (dry_run["duplicates"], dry_run["orphans"]) == (1, 3)
+    assert collection.deleted == []
+
+    summary = compact_collection(collection)
+    assert summary["after"] == 2
+    assert [row[0] for row in collection.rows] == ["1", "6"]
+
+
+def test_compact_never_deletes_an_id_repeated_across_pages(fake_collection):
+    from vector_store import compact_collection
+
+    rows = [("1", "a", [1.0, 0.0]), ("2", "b", [0.0, 1.0])]
+    # Unordered offset paging returns id "1" on both pages and never "2"
+    collection = fake_collection(rows, pages=[[rows[0]], [rows[0]]])
+
+    summary = compact_collection(collection, batch_size=1)
+
+    assert summary["duplicates"] == 0
+    assert collection.deleted == []